@@ -0,0 +1,135 @@
+## =======================================================
+## Program: Project Catalog (project_catalog)
+## Created Time: 2026-10-19
+## Shared by: marm2.py, edx_generater.py
+## Company: University of Waterloo
+## Department: School of Computer Science
+## =======================================================
+
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+# ====================================================================
+# FOLLOWING IS PROJECT NAME SETUP
+# ====================================================================
+# Marmoset project names look like A7P4, a11bonus, LAB3P1 or a5p3-extended
+PROJECT_PATTERN = re.compile(r'(?P<type>[a-z]+?)(?P<assignment>\d+)(?P<part>[a-z][a-z0-9]*)?(?P<extended>-extended)?',
+                             re.IGNORECASE)
+
+# Roles of a project in config.csv (isHandMarking)
+ROLE_MEMORY = 'memory'
+ROLE_STYLE = 'style'
+
+# ====================================================================
+# Functions
+# ====================================================================
+
+class Project(NamedTuple):
+    """
+    A parsed project name.
+
+    - name (str): The name as given, e.g. 'a5p3-extended'.
+    - base (str): The name without the '-extended' suffix, e.g. 'a5p3'.
+    - type (str): Lower-case project type, e.g. 'a' or 'lab'. Names that are not
+      assignment projects (e.g. 'midterm') use the whole lower-cased name.
+    - assignment (int or None): The assignment number, e.g. 5 (None for 'midterm').
+    - part (str): Lower-case part after the number, e.g. 'p3' or 'bonus'.
+    - extended (bool): True for '-extended' projects.
+    - role (str): ROLE_MEMORY, ROLE_STYLE or '' when the project is only auto-marked.
+    """
+    name: str
+    base: str
+    type: str
+    assignment: Optional[int]
+    part: str
+    extended: bool
+    role: str = ''
+
+
+def _to_project(name: str, match):
+    if match is None:
+        return Project(name, name, name.lower(), None, '', False)
+    return Project(name=name,
+                   base=name[:match.end('part')] if match.group('part') else name[:match.end('assignment')],
+                   type=match.group('type').lower(),
+                   assignment=int(match.group('assignment')),
+                   part=(match.group('part') or '').lower(),
+                   extended=match.group('extended') is not None)
+
+
+@lru_cache(maxsize=None)
+def parse_project(name: str):
+    """
+    Parses a full project name into a Project record. Results are cached, so each
+    distinct name is only parsed once per process.
+
+    Parameters:
+    - name (str): The project name, e.g. 'A10P2' or 'a5p3-extended'.
+
+    Returns:
+    - Project: The parsed record.
+
+    Example:
+    parse_project('a10p2').assignment == 10
+    """
+    return _to_project(name, PROJECT_PATTERN.fullmatch(name))
+
+
+@lru_cache(maxsize=None)
+def find_project(text: str):
+    """
+    Parses the project name at the start of a string such as a file name.
+
+    Parameters:
+    - text (str): The string, e.g. 'a5p3-extended-grades.csv' or 'a7p1_style.csv'.
+
+    Returns:
+    - Project or None: The record of the leading project name, or None if the
+      string does not start with one.
+
+    Example:
+    find_project('a5p3-extended-grades.csv').name == 'a5p3-extended'
+    """
+    match = PROJECT_PATTERN.match(text)
+    if match is None:
+        return None
+    return _to_project(match.group(0), match)
+
+
+def add_project(catalog: dict, project: Project):
+    """
+    Adds a project record to a catalog and its indexes.
+
+    Parameters:
+    - catalog (dict): A catalog created by `build_catalog`.
+    - project (Project): The record to add.
+    """
+    catalog['projects'][project.name] = project
+    catalog['by_assignment'].setdefault(project.assignment, []).append(project)
+    catalog['by_type'].setdefault(project.type, []).append(project)
+
+
+def build_catalog(project_names, roles: dict = None):
+    """
+    Builds a catalog of projects, parsing every name once.
+
+    Parameters:
+    - project_names (iterable): The project names.
+    - roles (dict): Optional mapping from project name to ROLE_MEMORY or ROLE_STYLE.
+
+    Returns:
+    - dict: A dictionary with three keys:
+        - 'projects': project name -> Project.
+        - 'by_assignment': assignment number -> list of Project.
+        - 'by_type': project type -> list of Project.
+
+    Example:
+    catalog = build_catalog(['a1p1', 'a1p2', 'a10p1'])
+    [p.name for p in catalog['by_assignment'][1]] == ['a1p1', 'a1p2']
+    """
+    roles = roles or {}
+    catalog = {'projects': {}, 'by_assignment': {}, 'by_type': {}}
+    for name in project_names:
+        add_project(catalog, parse_project(name)._replace(role=roles.get(name, '')))
+    return catalog
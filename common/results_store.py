@@ -0,0 +1,157 @@
+## =======================================================
+## Program: Marmoset Results Store (results_store)
+## Created Time: 2026-10-19
+## Shared by: marm2.py, edx_generater.py, edx_stats.py
+## Company: University of Waterloo
+## Department: School of Computer Science
+## =======================================================
+
+import csv
+import os
+import sqlite3
+from datetime import datetime
+
+# ====================================================================
+# FOLLOWING IS STORE SETUP
+# ====================================================================
+# One SQLite file per marks folder (e.g. marmoset_result) holds the marks of every project
+RESULTS_STORE = 'marks.sqlite'
+
+# Optional per-project export, and the only format of terms older than the store
+CSV_PREFIX = 'project-'
+CSV_SUFFIX = '-grades.csv'
+
+# Seconds to wait for another process (e.g. a parallel marks stage) to release the store
+STORE_TIMEOUT = 60
+
+# ====================================================================
+# Functions
+# ====================================================================
+
+def store_path(folder: str):
+    """
+    Returns the path of the results store of a marks folder.
+    """
+    return os.path.join(folder, RESULTS_STORE)
+
+
+def csv_path(folder: str, project_name: str):
+    """
+    Returns the path of the per-project CSV export, e.g. project-a5p3-grades.csv.
+    """
+    return os.path.join(folder, f"{CSV_PREFIX}{project_name}{CSV_SUFFIX}")
+
+
+def csv_results(folder: str):
+    """
+    Reads the per-project CSV files of a marks folder.
+
+    Parameters:
+    - folder (str): The marks folder.
+
+    Returns:
+    - dict: Maps each project name to a list of (student, mark) rows, in file order.
+    """
+    results = {}
+    if os.path.isdir(folder):
+        for file in sorted(os.listdir(folder)):
+            if file.startswith(CSV_PREFIX) and file.endswith(CSV_SUFFIX):
+                with open(os.path.join(folder, file), mode='r') as infile:
+                    results[file[len(CSV_PREFIX):-len(CSV_SUFFIX)]] = [(row[0], row[1]) for row in csv.reader(infile) if row]
+    return results
+
+
+def open_store(folder: str):
+    """
+    Opens (and creates if needed) the results store of a marks folder.
+
+    Parameters:
+    - folder (str): The marks folder.
+
+    Returns:
+    - Connection: The SQLite connection.
+
+    The store has two tables:
+    - results(project, student, mark): one row per student and project, keyed by (project, student).
+    - projects(project, updated): when each project was last written.
+
+    When the store is created, the CSV files already in the folder are imported, so a
+    term started before the store keeps its marks.
+
+    Note:
+    - The tables are created and the CSV files imported in one BEGIN IMMEDIATE transaction,
+      so when several processes open a new store at once, exactly one imports and the others
+      wait for it (up to STORE_TIMEOUT seconds) and then see the imported marks.
+    """
+    db = sqlite3.connect(store_path(folder), timeout=STORE_TIMEOUT)
+    try:
+        db.execute("begin immediate")
+        is_new = db.execute("select count(*) from sqlite_master where type = 'table' and name = 'results'").fetchone()[0] == 0
+        if is_new:
+            db.execute("""create table if not exists results(project text, student text, mark numeric,
+                                                             primary key (project, student)) without rowid""")
+            db.execute("create table if not exists projects(project text primary key, updated text)")
+            for project_name, rows in csv_results(folder).items():
+                write_project(db, project_name, rows)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        db.close()
+        raise
+    return db
+
+
+def read_project(db: sqlite3.Connection, project_name: str):
+    """
+    Returns the marks of one project as a dictionary mapping student to mark.
+    """
+    return dict(db.execute("select student, mark from results where project = ?", (project_name,)))
+
+
+def replace_project(db: sqlite3.Connection, project_name: str, rows: list):
+    """
+    Replaces all the marks of one project in a single transaction.
+
+    Parameters:
+    - db (Connection): The connection returned by `open_store`.
+    - project_name (str): The project name.
+    - rows (list): (student, mark) rows; students not in it are removed from the project.
+    """
+    with db:
+        write_project(db, project_name, rows)
+
+
+def write_project(db: sqlite3.Connection, project_name: str, rows: list):
+    """
+    Replaces all the marks of one project inside the caller's transaction (see `replace_project`).
+    """
+    db.execute("delete from results where project = ?", (project_name,))
+    db.executemany("insert into results values (?, ?, ?)", [(project_name, uw_id, mark) for uw_id, mark in rows])
+    db.execute("insert or replace into projects values (?, ?)",
+               (project_name, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+
+def load_results(folder: str):
+    """
+    Reads the marks of every project of a marks folder.
+
+    Parameters:
+    - folder (str): The marks folder.
+
+    Returns:
+    - dict: Maps each project name to a list of (student, mark) rows.
+
+    The store is read with one sequential scan in (project, student) order. Folders
+    without a store (older terms) fall back to the per-project CSV files.
+
+    Example:
+    results = load_results("~/marks/current_term/marmoset_result")
+    """
+    if not os.path.exists(store_path(folder)):
+        return csv_results(folder)
+    results = {}
+    db = sqlite3.connect(store_path(folder))
+    for project_name, uw_id, mark in db.execute("select project, student, mark from results order by project, student"):
+        results.setdefault(project_name, []).append((uw_id, mark))
+    db.close()
+    return results
@@ -28,32 +28,41 @@ def get_student_list(classlist_file: str):
     return studentList
 
 
-def diff(old_result, new_result, classlist):
+def parse_scores(lines):
     """
-    Compares scores between two result sets for assignments by name,
-    ensuring alignment in printed output.
+    Parses the content of an edx_marks.csv file.
+
+    Parameters:
+    - lines (iterable): The lines of the file.
+
+    Returns:
+    - tuple: The header row and a dictionary mapping each student to their
+      {assessment: score} values, kept as strings.
     """
-    student_list = get_student_list(classlist)
-    old_scores = {}
-    new_scores = {}
+    data = csv.reader(lines)
+    headers = next(data)
+    scores = {}
+    for row in data:
+        scores[row[0]] = {headers[i]: row[i] for i in range(1, len(row))}
+    return headers, scores
 
-    with open(old_result, mode='r') as file1:
-        data1 = csv.reader(file1)
-        headers_old = next(data1)
-        for row in data1:
-            student_scores = {headers_old[i]: row[i] for i in range(1, len(row))}
-            old_scores[row[0]] = student_scores
 
-    with open(new_result, mode='r') as file2:
-        data2 = csv.reader(file2)
-        headers_new = next(data2)
-        for row in data2:
-            student_scores = {headers_new[i]: row[i] for i in range(1, len(row))}
-            new_scores[row[0]] = student_scores
+def diff_scores(headers_old, old_scores, headers_new, new_scores, student_list):
+    """
+    Compares two sets of scores by assessment name.
 
-    common_assignments = set(headers_old).intersection(headers_new)
-    common_assignments.remove('')
+    Parameters:
+    - headers_old, old_scores: The previous marks, as returned by `parse_scores`.
+    - headers_new, new_scores: The new marks, in the same form.
+    - student_list (list): The students to compare, in output order.
+
+    Returns:
+    - list: One aligned line per changed score, e.g. '[j25smith - Assignment3       ] 80.0 -> 90.0'.
+      Only students and assessments present in both sets are compared.
+    """
+    common_assignments = [assignment for assignment in headers_new if assignment in headers_old and assignment != '']
 
+    lines = []
     for uw_id in student_list:
         if uw_id not in old_scores or uw_id not in new_scores:
             continue
@@ -62,7 +71,25 @@ def diff(old_result, new_result, classlist):
             old_score = old_scores[uw_id].get(assignment, "Missing")
             new_score = new_scores[uw_id].get(assignment, "Missing")
             if old_score != new_score:
-                 print(f"[{uw_id:<8} - {assignment:<16}] {old_score} -> {new_score}")
+                 lines.append(f"[{uw_id:<8} - {assignment:<16}] {old_score} -> {new_score}")
+    return lines
+
+
+def diff(old_result, new_result, classlist):
+    """
+    Compares scores between two result sets for assignments by name,
+    ensuring alignment in printed output.
+    """
+    student_list = get_student_list(classlist)
+
+    with open(old_result, mode='r') as file1:
+        headers_old, old_scores = parse_scores(file1)
+
+    with open(new_result, mode='r') as file2:
+        headers_new, new_scores = parse_scores(file2)
+
+    for line in diff_scores(headers_old, old_scores, headers_new, new_scores, student_list):
+        print(line)
 
 
 def main():
@@ -72,4 +99,6 @@ def main():
         classlist = sys.argv[3]
         diff(old_result, new_result, classlist)
 
-main()
+
+if __name__ == '__main__':
+    main()
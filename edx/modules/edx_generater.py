@@ -9,13 +9,26 @@
 ## Department: School of Computer Science
 ## =======================================================
 
+import argparse
 import csv
 import getpass
+import hashlib
+import json
 import os
-import pandas as pd
-import re
+import resource
+import sqlite3
 import subprocess
-from openpyxl import load_workbook
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'common'))
+from project_catalog import ROLE_MEMORY, ROLE_STYLE, build_catalog, find_project, parse_project
+from results_store import load_results
+from edx_diff import diff_scores, parse_scores
 
 # ====================================================================
 # FOLLOWING IS ASSIGNMENT SETUP
@@ -32,6 +45,9 @@ OVERALL_STYLE = TOTAL_ASSESSMENT
 STYLE_ASSIGNMENTS_NUM = ASSIGNMENTS_NUM - UNSTYLE_ASSIGNMENTS_NUM
 MIDTERM_INDEX = TOTAL_ASSESSMENT - 1
 
+# bump when the marks calculation changes, so saved marks are not reused
+MARKS_STATE_VERSION = 1
+
 # ====================================================================
 # FOLLOWING IS ENV VARIABLES
 # ====================================================================
@@ -56,21 +72,11 @@ CURR_YEAR_CMD = "/u/isg/bin/termcode -l | awk '{print substr($0, length($0)-1, l
 CURR_YEAR = subprocess.check_output(CURR_YEAR_CMD, shell=True).decode('utf-8').strip()
 
 # Path will be used
+# (files inside a term folder are listed in term_paths)
 TERM_FOLDER = f"{CURR_TERMCODE}_{CURR_SESSION}{CURR_YEAR}"
 PATH_CURRTERM = f"{HOME}/marks/current_term/"
-PATH_TERM_DATA = f"{HOME}/marks/past_terms/{TERM_FOLDER}"
-PATH_A0_RESULT = f"{PATH_TERM_DATA}/a0_result.txt"
-PATH_CLASSLIST = f"{PATH_TERM_DATA}/classlist.csv"
-PATH_CONFIG = f"{PATH_TERM_DATA}/config.csv"
-PATH_EDX_MARKS = f"{PATH_TERM_DATA}/edx_marks.csv"
-PATH_EXEMPTION = f"{PATH_TERM_DATA}/exemptions.csv"
-PATH_GRADEBOOK = f"{PATH_TERM_DATA}/gradebook/gradebook.xlsx"
-PATH_ICLICKER = f"{PATH_TERM_DATA}/clicker_result/final_grades.csv"
-PATH_MARKUS_RESULT = f"{PATH_TERM_DATA}/markus_result"
-PATH_MARMOSET_RESULT = f"{PATH_TERM_DATA}/marmoset_result"
-PATH_MIDTERM_RESULT = f"{PATH_TERM_DATA}/midterm"
-PATH_REMARK = f"{PATH_TERM_DATA}/remarks.csv"
-PATH_STATS = f"{PATH_TERM_DATA}/stats.txt"
+PATH_PAST_TERMS = f"{HOME}/marks/past_terms"
+PATH_TERM_DATA = f"{PATH_PAST_TERMS}/{TERM_FOLDER}"
 
 # Path of database infromation
 PATH_DB_INFO = f"{HOME}/.my.cnf"
@@ -83,6 +89,109 @@ MARKUS = False
 # Helper Functions
 # ====================================================================
 
+def term_paths(term_data: str):
+    """
+    Returns the paths of the input and output files of one term folder.
+
+    Parameters:
+    - term_data (str): The term folder, e.g. ~/marks/past_terms/1241_w24.
+
+    Returns:
+    - dict: File and folder paths keyed by their role.
+
+    Example:
+    paths = term_paths(PATH_TERM_DATA)
+    paths['edx_marks']
+    """
+    return {'a0_result': f"{term_data}/a0_result.txt",
+            'classlist': f"{term_data}/classlist.csv",
+            'config': f"{term_data}/config.csv",
+            'edx_marks': f"{term_data}/edx_marks.csv",
+            'marks_db': f"{term_data}/edx_marks.sqlite",
+            'marks_state': f"{term_data}/log/marks_state.json",
+            'exemption': f"{term_data}/exemptions.csv",
+            'gradebook': f"{term_data}/gradebook/gradebook.xlsx",
+            'iclicker': f"{term_data}/clicker_result/final_grades.csv",
+            'markus_result': f"{term_data}/markus_result",
+            'marmoset_result': f"{term_data}/marmoset_result",
+            'midterm_result': f"{term_data}/midterm",
+            'remark': f"{term_data}/remarks.csv",
+            'stats': f"{term_data}/stats.txt"}
+
+
+def resolve_term(term: str):
+    """
+    Resolves a term argument to its term folder.
+
+    Parameters:
+    - term (str): A folder name under ~/marks/past_terms (e.g. 1241_w24) or a path.
+
+    Returns:
+    - str: The term folder path.
+    """
+    if os.path.isdir(term):
+        return os.path.abspath(term)
+    return f"{PATH_PAST_TERMS}/{term}"
+
+
+@contextmanager
+def stage(metrics: list, name: str):
+    """
+    Measures one stage of the pipeline and appends its metrics to `metrics`.
+
+    Parameters:
+    - metrics (list): The list receiving one record per stage.
+    - name (str): The stage name.
+
+    Yields:
+    - dict: The stage record; the stage may set 'rows' on it.
+
+    Each record holds the wall-clock 'seconds' of the stage. While tracemalloc is
+    tracing (see --metrics), it also holds 'peak_alloc_kb': the highest Python memory
+    in use while this stage ran. The peak is reset when each stage starts, so it
+    is not carried over from earlier stages.
+
+    Example:
+    with stage(metrics, 'load_result_dict') as record:
+        marks = load_result_dict(path)
+        record['rows'] = len(marks)
+    """
+    record = {'stage': name, 'rows': None}
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    start_time = time.perf_counter()
+    yield record
+    record['seconds'] = round(time.perf_counter() - start_time, 4)
+    if tracemalloc.is_tracing():
+        record['peak_alloc_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+    metrics.append(record)
+
+
+def write_metrics(metrics_path: str, term_data: str, gradebook: bool, metrics: list):
+    """
+    Writes the stage metrics of a run as JSON, with the process 'peak_rss_kb'
+    (high-water mark of resident memory over the whole run).
+
+    Parameters:
+    - metrics_path (str): The JSON file path, usually log/<timestamp>/metrics.json.
+    - term_data (str): The term folder that was generated.
+    - gradebook (bool): Whether the grade book was generated.
+    - metrics (list): The stage records collected with `stage`.
+
+    Note:
+    - In batch runs a worker process may have generated other terms before this one,
+      so 'peak_rss_kb' is an upper bound there; 'peak_alloc_kb' of each stage is exact.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(metrics_path)), exist_ok=True)
+    with open(metrics_path, mode='w') as outfile:
+        json.dump({'time': datetime.today().isoformat(timespec='seconds'),
+                   'term': os.path.basename(term_data),
+                   'gradebook': gradebook,
+                   'total_seconds': round(sum(record['seconds'] for record in metrics), 4),
+                   'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   'stages': metrics}, outfile, indent=1)
+
+
 def assignment_setup_reader(file_path: str):
     """
     Reads the configuration file to set up assignment details, including
@@ -96,15 +205,18 @@ def assignment_setup_reader(file_path: str):
         - projects_info (dict): Information about each project, including
           full marks and weight.
         - memory_questions (dict): Details of memory questions, if any.
+        - catalog (dict): The project catalog of every configured project,
+          with memory/style roles set (see project_catalog.build_catalog).
 
     Example:
     projects_info,
     memory_questions,
-    current_assignment = assignment_setup_reader('config.csv')
+    catalog = assignment_setup_reader('config.csv')
     """
     print(">> Loding config")
     projects_info = {}
     memory_questions = {}
+    roles = {}
     current_assignment = 0
     with open(file_path, mode='r') as infile:
         reader = csv.DictReader(infile)
@@ -114,15 +226,17 @@ def assignment_setup_reader(file_path: str):
                 if project_name == 'midterm':
                     current_assignment = project_name.capitalize()
                 else:
-                    current_assignment = f"Assignment {project_name[1]}"
+                    current_assignment = f"Assignment {parse_project(project_name).assignment}"
                 project_fullmark = int(row['fullMarks'])
                 project_weight = int(row['weight'])
                 marking_type = row['isHandMarking']
                 if marking_type == '1':
+                    roles[project_name] = ROLE_MEMORY
                     memory_questions[project_name] = {'complete': False, 
-                                                      'marmoset_path': '', 
+                                                      'marmoset_results': [], 
                                                       'markus_path': ''}
                 if marking_type == '2':
+                    roles[project_name] = ROLE_STYLE
                     style_weight = int(row['styleWeight'])
                 else:
                     style_weight = 0
@@ -130,7 +244,7 @@ def assignment_setup_reader(file_path: str):
                                                'weight': project_weight, 
                                                'styleWeight': style_weight}
     print(f"   |> Latest assessment in config is {current_assignment}")
-    return projects_info, memory_questions
+    return projects_info, memory_questions, build_catalog(projects_info, roles)
 
 
 def load_result_dict(classlist_path: str):
@@ -142,6 +256,8 @@ def load_result_dict(classlist_path: str):
 
     Returns:
     - dict: A dictionary with student IDs as keys and lists of zeros for marks.
+      Each assessment holds its 'total', its weighted 'assignment_part' marks and
+      the 'raw' marks read from the result files (see `record_raw_mark`).
 
     Example:
     data_dict = load_result_dict('classlist.csv')
@@ -154,10 +270,12 @@ def load_result_dict(classlist_path: str):
             if row:
                 uw_id = row[1]
                 data_dict[uw_id] = [{'total': 0.0, 
-                                     'assignment_part': {}} for _ in range(TOTAL_ASSESSMENT)] \
+                                     'assignment_part': {},
+                                     'raw': {}} for _ in range(TOTAL_ASSESSMENT)] \
                                  + [{'total': 0.0, 
                                      'assignment_part': 
-                                     {f'Assignment {i + UNSTYLE_ASSIGNMENTS_NUM}': 0.0 for i in range(STYLE_ASSIGNMENTS_NUM)}}]
+                                     {f'Assignment {i + UNSTYLE_ASSIGNMENTS_NUM}': 0.0 for i in range(STYLE_ASSIGNMENTS_NUM)},
+                                     'raw': {}}]
     return data_dict
 
 
@@ -223,11 +341,117 @@ def get_remarked_grade(questin_type: bool, project_name: str, remarks_dict: dict
             return float(new_grades)
     return grades
 
+
+def record_raw_mark(assessment: dict, project_name: str, source: str, raw: float, remarked: float):
+    """
+    Records a mark as read from a result file, before weighting.
+
+    Parameters:
+    - assessment (dict): One assessment entry of a student in the marks dictionary.
+    - project_name (str): The name of the project.
+    - source (str): Where the mark comes from: 'marmoset', 'markus' or 'midterm'.
+    - raw (float): The mark in the result file.
+    - remarked (float): The mark after remarks.csv was applied.
+    """
+    assessment['raw'].setdefault(project_name, {})[source] = (raw, remarked)
+
+
+def input_digests(paths: dict, students: list, marmoset_results: dict):
+    """
+    Fingerprints the inputs of `generate_term`, separately for every student.
+
+    Parameters:
+    - paths (dict): The term paths returned by `term_paths`.
+    - students (list): The student IDs of the class list.
+    - marmoset_results (dict): The Marmoset results returned by `load_results`.
+
+    Returns:
+    - tuple: The digest of everything not tied to a student (config, headers, project
+      names) and a dictionary mapping each student ID to the digest of their own rows.
+
+    `students` should also hold the students of the previous run, so that rows left
+    behind by dropped students do not change the shared digest. A row belongs to a
+    student if its first field is the student ID, or if one of its fields is an email
+    address of the student (midterm results). A student whose digest and the shared
+    digest are unchanged will get exactly the same marks.
+    """
+    def read_rows(file_path):
+        with open(file_path, mode='r', newline='') as infile:
+            return list(csv.reader(infile))
+
+    term_data = os.path.dirname(paths['config'])
+    sources = [(os.path.relpath(file_path, term_data), read_rows(file_path))
+               for file_path in (paths['config'], paths['remark'], paths['exemption'])]
+    for folder in (paths['markus_result'], paths['midterm_result']):
+        sources += [(os.path.relpath(f"{folder}/{file}", term_data), read_rows(f"{folder}/{file}"))
+                    for file in sorted(os.listdir(folder))]
+    sources += [(f"marmoset:{project_name}", [[uw_id, str(mark)] for uw_id, mark in results])
+                for project_name, results in sorted(marmoset_results.items())]
+
+    students = set(students)
+    shared = hashlib.sha1(f"{MARKS_STATE_VERSION},{TOTAL_ASSESSMENT}".encode())
+    student_digests = {}
+    for name, rows in sources:
+        shared.update(f"{name}\n".encode())
+        for row in rows:
+            line = f"{name}\0{','.join(row)}\n".encode()
+            uw_id = None
+            if row and row[0] in students:
+                uw_id = row[0]
+            else:
+                for field in row:
+                    if '@' in field and field.split('@')[0] in students:
+                        uw_id = field.split('@')[0]
+                        break
+            if uw_id is None:
+                shared.update(line)
+            else:
+                student_digests.setdefault(uw_id, hashlib.sha1()).update(line)
+    return shared.hexdigest(), {uw_id: student_digests[uw_id].hexdigest() if uw_id in student_digests else ''
+                                for uw_id in students}
+
+
+def load_marks_state(marks_state_path: str):
+    """
+    Loads the finalized marks saved by the previous run.
+
+    Parameters:
+    - marks_state_path (str): The state file written by `save_marks_state`.
+
+    Returns:
+    - dict: {'shared': shared digest, 'students': student ID -> {'digest', 'marks'}};
+      without students if there is no state yet.
+    """
+    if not os.path.exists(marks_state_path):
+        return {'shared': '', 'students': {}}
+    with open(marks_state_path, mode='r') as infile:
+        return json.load(infile)
+
+
+def save_marks_state(marks_state_path: str, shared_digest: str, student_digests: dict, marks_dict: dict):
+    """
+    Saves the finalized marks of every student with the digests of their inputs.
+
+    Parameters:
+    - marks_state_path (str): The state file path; it is replaced atomically.
+    - shared_digest (str): The shared digest returned by `input_digests`.
+    - student_digests (dict): The per-student digests returned by `input_digests`.
+    - marks_dict (dict): The finalized marks (without 'mark_status').
+    """
+    os.makedirs(os.path.dirname(marks_state_path), exist_ok=True)
+    state = {'shared': shared_digest,
+             'students': {uw_id: {'digest': student_digests[uw_id], 'marks': marks_dict[uw_id]}
+                          for uw_id in marks_dict if uw_id != 'mark_status'}}
+    temp_path = f"{marks_state_path}.tmp"
+    with open(temp_path, mode='w') as outfile:
+        json.dump(state, outfile)
+    os.replace(temp_path, marks_state_path)
+
 # ====================================================================
 # Functions
 # ====================================================================
 
-def calculate_assignments_marks(project_dict: dict, project_name: str, marks_dict: dict, remarks_dict: dict, file_path: str):
+def calculate_assignments_marks(project_dict: dict, project_name: str, marks_dict: dict, remarks_dict: dict, results: list):
     """
     Calculates and updates the marks for assignments for each student, taking into account
     remarks and the assignment weight.
@@ -237,27 +461,25 @@ def calculate_assignments_marks(project_dict: dict, project_name: str, marks_dic
     - project_name (str): The name of the project.
     - marks_dict (dict): Dictionary to store students' marks.
     - remarks_dict (dict): Dictionary containing any remarks.
-    - file_path (str): Path to the file with assignment results.
+    - results (list): The project's (student, mark) rows from the Marmoset results (see `load_results`).
 
     Example:
-    calculate_assignments_marks(project_info, 'Project1', marks_dict, remarks_dict, 'results.csv')
+    calculate_assignments_marks(project_info, 'Project1', marks_dict, remarks_dict, [('j25smith', 8)])
     """
-    assignment_number = int(project_name[1])
+    assignment_number = parse_project(project_name).assignment
     full_marks = project_dict[project_name]['fullMark']
     weight = project_dict[project_name]['weight']
     marks_dict['mark_status'][assignment_number] = 1
-    with open(file_path, mode='r') as infile:
-        reader = csv.reader(infile)
-        for row in reader:
-            uw_id = row[0]
-            if uw_id in marks_dict:
-                total = float(row[1])
-                total = get_remarked_grade(MARMOSET, project_name, remarks_dict, uw_id, total)
-                if total <= full_marks:
-                    grades = total / full_marks * weight
-                    marks_dict[uw_id][assignment_number]['assignment_part'][project_name] = grades
-                else:
-                    print(f"Please check configuration of Assignment {assignment_number} or remarks.csv")
+    for uw_id, mark in results:
+        if uw_id in marks_dict:
+            raw = float(mark)
+            total = get_remarked_grade(MARMOSET, project_name, remarks_dict, uw_id, raw)
+            record_raw_mark(marks_dict[uw_id][assignment_number], project_name, 'marmoset', raw, total)
+            if total <= full_marks:
+                grades = total / full_marks * weight
+                marks_dict[uw_id][assignment_number]['assignment_part'][project_name] = grades
+            else:
+                print(f"Please check configuration of Assignment {assignment_number} or remarks.csv")
 
 
 def calculate_midterm_marks(project_dict: dict, project_name: str, marks_dict: dict, remarks_dict: dict, file_path: str):
@@ -282,8 +504,9 @@ def calculate_midterm_marks(project_dict: dict, project_name: str, marks_dict: d
         for row in reader:
             uw_id = row['Email'].split('@')[0]
             if uw_id in marks_dict:
-                total = float(row['Total'])
-                total = get_remarked_grade(MIDTERM, project_name, remarks_dict, uw_id, total)
+                raw = float(row['Total'])
+                total = get_remarked_grade(MIDTERM, project_name, remarks_dict, uw_id, raw)
+                record_raw_mark(marks_dict[uw_id][MIDTERM_INDEX], project_name, 'midterm', raw, total)
                 if total <= full_marks:
                     grades = total / full_marks * weight
                     marks_dict[uw_id][MIDTERM_INDEX]['assignment_part'][project_name] = grades
@@ -305,7 +528,7 @@ def calculate_style_marks(project_dict: dict, memory_questions_dict: dict, proje
     Example:
     calculate_style_marks(memory_questions, 'Project2', marks_dict, remarks_dict, 'style_results.csv')
     """
-    assignment_number = int(project_name[1])
+    assignment_number = parse_project(project_name).assignment
     style_index = assignment_number + UNSTYLE_ASSIGNMENTS_NUM
     marks_dict['mark_status'][style_index] = 1
     style_weight = project_dict[project_name]['styleWeight']
@@ -316,8 +539,9 @@ def calculate_style_marks(project_dict: dict, memory_questions_dict: dict, proje
             for row in reader:
                 uw_id = row[0]
                 if uw_id in marks_dict:
-                    total = float(row[1])
-                    total = get_remarked_grade(MARKUS, project_name, remarks_dict, uw_id, total)
+                    raw = float(row[1])
+                    total = get_remarked_grade(MARKUS, project_name, remarks_dict, uw_id, raw)
+                    record_raw_mark(marks_dict[uw_id][style_index], project_name, 'markus', raw, total)
                     if total <= full_marks:
                         grades = total / full_marks * style_weight
                         marks_dict[uw_id][style_index]['assignment_part'][project_name] = grades
@@ -336,41 +560,41 @@ def calculate_memory_marks(project_dict: dict, project_name: str, project_info:
     Parameters:
     - project_dict (dict): A dictionary with project names as keys and tuples of full marks and weight as values.
     - project_name (str): The name of the current project being processed.
-    - project_info (dict): A dict containing information about the project, including completion status and paths to grades.
+    - project_info (dict): A dict containing information about the project, including completion status,
+      its Marmoset results and the path to its MarkUs grades.
     - marks_dict (dict): A dictionary with student IDs as keys and a list of their marks as values.
     - remarks_dict (dict): A dictionary containing any remark requests.
 
     Requires:
     - Correct initialization and population of project_dict, project_name, project_info, marks_dict, and remarks_dict.
-    - Existence and readability of files at paths specified in project_info.
+    - Existence and readability of the MarkUs file specified in project_info.
 
     Effects:
     - Updates `marks_dict` with calculated memory marks for the specified project.
     """
-    assignment_number = int(project_name[1])
+    assignment_number = parse_project(project_name).assignment
     full_marks = project_dict[project_name]['fullMark']
     weight = project_dict[project_name]['weight']
     is_complete = project_info['complete']
-    marmoset_path = project_info['marmoset_path']
+    marmoset_results = project_info['marmoset_results']
     markus_path = project_info['markus_path']
     marmoset_grades = {}
     if is_complete:
-        with open(marmoset_path, mode='r') as infile:
-            reader = csv.reader(infile)
-            for row in reader:
-                uw_id = row[0]
-                if uw_id in marks_dict:
-                    grades = float(row[1])
-                    grades = get_remarked_grade(MARMOSET, project_name, remarks_dict, uw_id, grades)
-                    marmoset_grades[uw_id] = grades / full_marks * weight
+        for uw_id, mark in marmoset_results:
+            if uw_id in marks_dict:
+                raw = float(mark)
+                grades = get_remarked_grade(MARMOSET, project_name, remarks_dict, uw_id, raw)
+                record_raw_mark(marks_dict[uw_id][assignment_number], project_name, 'marmoset', raw, grades)
+                marmoset_grades[uw_id] = grades / full_marks * weight
 
         with open(markus_path, mode='r') as infile:
             reader = csv.reader(infile)
             for row in reader:
                 uw_id = row[0]
                 if uw_id in marmoset_grades:
-                    grades = float(row[1])
-                    grades = get_remarked_grade(MARKUS, project_name, remarks_dict, uw_id, grades)
+                    raw = float(row[1])
+                    grades = get_remarked_grade(MARKUS, project_name, remarks_dict, uw_id, raw)
+                    record_raw_mark(marks_dict[uw_id][assignment_number], project_name, 'markus', raw, grades)
                     grades = marmoset_grades[uw_id] * grades / 100.0
                     marks_dict[uw_id][assignment_number]['assignment_part'][project_name] = grades
     else:
@@ -402,18 +626,20 @@ def finalize_marks(marks_dict: dict):
     - For assignments with both on-time and extended submissions for a project, the project's score 
       in 'assignment_part' is updated to the higher of the on-time score or the adjusted average.
     - Initializes the 'total' score for each assignment before summing to ensure accuracy.
+    - Keeps the on-time score of merged projects in the assignment's 'before_merge' dictionary.
     """
     for uw_id in marks_dict:
         if uw_id != 'mark_status':
             for assignment_number in range(TOTAL_ASSESSMENT + 1):
                 for project in marks_dict[uw_id][assignment_number]['assignment_part']:
-                    if 'extended' in project:
+                    if parse_project(project).extended:
                         extended_total = marks_dict[uw_id][assignment_number]['assignment_part'][project]
-                        project = project.split('-')[0]
+                        project = parse_project(project).base
                         ontime_total = marks_dict[uw_id][assignment_number]['assignment_part'][project]
+                        marks_dict[uw_id][assignment_number].setdefault('before_merge', {})[project] = ontime_total
                         marks_dict[uw_id][assignment_number]['assignment_part'][project] = max(ontime_total, ((ontime_total + extended_total) / 2))
                 for project in marks_dict[uw_id][assignment_number]['assignment_part']:
-                    if 'extended' not in project:
+                    if not parse_project(project).extended:
                         if marks_dict[uw_id][assignment_number]['total'] == 'X':
                             marks_dict[uw_id][assignment_number]['assignment_part'][project] = 0
                         else:
@@ -443,8 +669,8 @@ def set_exemptions(marks_dict: dict, exemption_file: str):
             uw_id = row[0]
             exemp_assign = row[1]
             if uw_id in marks_dict and (len(exemp_assign) >= 2):
-                if exemp_assign[1].isdigit():
-                    assignment_number = int(exemp_assign[1])
+                if parse_project(exemp_assign).assignment is not None:
+                    assignment_number = parse_project(exemp_assign).assignment
                     marks_dict[uw_id][assignment_number]['total'] = 'X'
                     if assignment_number >= UNSTYLE_ASSIGNMENTS_NUM:
                         marks_dict[uw_id][assignment_number + UNSTYLE_ASSIGNMENTS_NUM]['total'] = 'X'
@@ -453,48 +679,47 @@ def set_exemptions(marks_dict: dict, exemption_file: str):
                     marks_dict[uw_id][15]['total'] = 'X'
 
 
-def process_marks(project_dict: dict, memory_questions_dict: dict, result_dict: dict, remarks_dict: dict, marmoset_result: str, markus_result: str, midterm_result: str):
+def process_marks(project_dict: dict, memory_questions_dict: dict, catalog: dict, result_dict: dict, remarks_dict: dict, marmoset_results: dict, markus_result: str, midterm_result: str, exemption_file: str):
     """
     Orchestrates the processing of marks from various sources, including memory questions, assignments, and style marks.
 
     Parameters:
     - project_dict (dict): Contains project names with their full marks and weights.
     - memory_questions_dict (dict): Stores information for memory question projects.
+    - catalog (dict): The project catalog returned by `assignment_setup_reader`.
     - result_dict (dict): The main dictionary where student marks are accumulated.
     - remarks_dict (dict): Contains any remark requests.
-    - marmoset_result (str): Directory path containing Marmoset results.
+    - marmoset_results (dict): The Marmoset results of every project, as returned by `load_results`.
     - markus_result (str): Directory path containing Markus results.
+    - midterm_result (str): Directory path containing midterm results.
     - exemption_file (str): Path to the exemptions file.
 
     Requires:
     - All dictionaries and paths must be correctly initialized and accessible.
-    - The structure of files and directories at `marmoset_result` and `markus_result` must match expected patterns.
+    - The structure of files and directories at `markus_result` must match expected patterns.
 
     Effects:
     - Processes all marks, updates `result_dict`, and handles exemptions.
     """
 
     print(">> Processing assignment marks")
-    for file in os.listdir(marmoset_result):
-        if 'project' in file:
-            project_name = file.split('-')[1]
-            file_path = f'{marmoset_result}/{file}'
-            if project_name in project_dict:
-                if 'extended' in file:
-                    project_name = project_name + '-extended'
-                if project_name in memory_questions_dict:
-                    memory_questions_dict[project_name]['marmoset_path'] = file_path
-                else:
-                    calculate_assignments_marks(project_dict, project_name, result_dict, remarks_dict, file_path)
+    for marmoset_project, results in marmoset_results.items():
+        project = find_project(marmoset_project)
+        if project is not None and project.base in catalog['projects']:
+            project_name = project.name
+            if project_name in memory_questions_dict:
+                memory_questions_dict[project_name]['marmoset_results'] = results
+            else:
+                calculate_assignments_marks(project_dict, project_name, result_dict, remarks_dict, results)
 
     print(">> Processing style marks")
-    for project in os.listdir(markus_result):
-        match = re.match(r'([a-z\d]+(?:[a-z\d]+)?)*', project)
-        if match:
-            project_name = match.group(0)
-            file_path = f'{markus_result}/{project}'
-            if project_name in project_dict:
-                if project_name in memory_questions_dict:
+    for file in os.listdir(markus_result):
+        project = find_project(file)
+        if project is not None:
+            project_name = project.base
+            file_path = f'{markus_result}/{file}'
+            if project_name in catalog['projects']:
+                if catalog['projects'][project_name].role == ROLE_MEMORY:
                     memory_questions_dict[project_name]['markus_path'] = file_path
                     memory_questions_dict[project_name]['complete'] = True
                 else:
@@ -512,27 +737,27 @@ def process_marks(project_dict: dict, memory_questions_dict: dict, result_dict:
             if project_name in project_dict:
                 calculate_midterm_marks(project_dict, project_name, result_dict, remarks_dict, file_path)
     
-    set_exemptions(result_dict, PATH_EXEMPTION)
+    set_exemptions(result_dict, exemption_file)
 
 
-def generate_edx_marks(edx_marks_path: str, grade_book_path: str, marks_dict: dict):
+def generate_edx_marks(edx_marks_path: str, marks_dict: dict):
     """
-    Generates a CSV file with edx marks and updates an Excel grade book with assignment marks.
+    Generates a CSV file with edx marks for every assessment that has marks.
     
     Parameters:
     - edx_marks_path (str): The file path where the edx marks will be saved.
-    - grade_book_path (str): The file path of the grade book to be updated.
-    - current_assignment (int): The current assignment number up to which marks need to be generated.
     - marks_dict (dict): A dictionary with student IDs as keys and their marks as values.
     
+    Returns:
+    - list: The indices of the assessments written to the CSV, used by `generate_gradebook`.
+
     Requires:
-    - `edx_marks_path` and `grade_book_path` must be valid paths for writing.
-    - `current_assignment` must be a non-negative integer.
+    - `edx_marks_path` must be a valid path for writing.
     - `marks_dict` must be properly initialized and populated.
     
     Effects:
-    - Creates a CSV file at `edx_marks_path` with marks up to `current_assignment`.
-    - Updates or creates a grade book at `grade_book_path` with sheets for each assignment.
+    - Creates a CSV file at `edx_marks_path` with marks of every assessment marked so far.
+    - Removes the 'mark_status' entry from `marks_dict`.
     """
     mark_status = marks_dict['mark_status']
     assignment_index_list = []
@@ -565,47 +790,47 @@ def generate_edx_marks(edx_marks_path: str, grade_book_path: str, marks_dict: di
             writer.writerow(marks_result)
     
     print(">> Generated edx_marks.csv")
+    return assignment_index_list
+
+
+def gradebook_sheets(marks_dict: dict, assignment_index_list: list, iclicker_path: str):
+    """
+    Builds the content of every grade book sheet.
+
+    Parameters:
+    - marks_dict (dict): A dictionary with student IDs as keys and their marks as values.
+    - assignment_index_list (list): The assessment indices returned by `generate_edx_marks`.
+    - iclicker_path (str): Path of the iClicker final grades; the sheet is skipped if it does not exist.
+
+    Returns:
+    - dict: Sheet name -> (columns, rows) for the A{i}, AStyle and iClicker sheets.
+    """
+    sheets = {}
 
-    ## grade book generater
     # Assignment marks for grade book
     for i in assignment_index_list:
         if i < ASSIGNMENTS_NUM:
-            sheet_name = f'A{i}'
             rows = []
             for uw_id in marks_dict:
                 student_result = marks_dict[uw_id][i]
                 question_list = sorted(list(student_result['assignment_part'].keys()))
                 row = [uw_id] + [student_result['assignment_part'].get(q, 0) for q in question_list] + [student_result['total']]
                 rows.append(row)
-            df = pd.DataFrame(rows, columns=['student'] + question_list + ['Total (100)'])
+            sheets[f'A{i}'] = (['student'] + question_list + ['Total (100)'], rows)
 
-            with pd.ExcelWriter(grade_book_path, engine='openpyxl', mode='a', if_sheet_exists='overlay') as writer:
-                book = writer.book
-                if sheet_name in book.sheetnames:
-                    del book[sheet_name]
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
-    
     # Assignment style marks for grade book
-    sheet_name = 'AStyle'
     rows = []
     for uw_id in marks_dict:
         student_result = marks_dict[uw_id][OVERALL_STYLE]
         question_list = sorted(list(student_result['assignment_part'].keys()))
         row = [uw_id] + [student_result['assignment_part'].get(q, 0) for q in question_list] + [student_result['total']]
         rows.append(row)
-    df = pd.DataFrame(rows, columns=['student'] + question_list + ['Total (100)'])
+    sheets['AStyle'] = (['student'] + question_list + ['Total (100)'], rows)
 
-    with pd.ExcelWriter(grade_book_path, engine='openpyxl', mode='a', if_sheet_exists='overlay') as writer:
-        book = writer.book
-        if sheet_name in book.sheetnames:
-            del book[sheet_name]
-        df.to_excel(writer, sheet_name=sheet_name, index=False)
-    
     # Assignment iclicker marks for grade book
-    if os.path.exists(PATH_ICLICKER):
-        sheet_name = 'iClicker'
+    if os.path.exists(iclicker_path):
         rows = []
-        with open(PATH_ICLICKER, mode='r') as infile:
+        with open(iclicker_path, mode='r') as infile:
             reader = csv.reader(infile)
             for row in reader:
                 uw_id = row[0]
@@ -613,14 +838,66 @@ def generate_edx_marks(edx_marks_path: str, grade_book_path: str, marks_dict: di
                     grades = float(row[1])
                     row = [uw_id, grades, grades / ICLICKER_WEIGHT * 100]
                     rows.append(row)
-        df = pd.DataFrame(rows, columns=['student', 'Marks', 'Total (100)'])
+        sheets['iClicker'] = (['student', 'Marks', 'Total (100)'], rows)
+    return sheets
+
+
+def generate_gradebook(grade_book_path: str, marks_dict: dict, assignment_index_list: list, iclicker_path: str):
+    """
+    Updates an Excel grade book with per-question assignment, style and iClicker marks,
+    rewriting only the sheets whose content changed since the last run.
 
-        with pd.ExcelWriter(grade_book_path, engine='openpyxl', mode='a', if_sheet_exists='overlay') as writer:
-            book = writer.book
+    Parameters:
+    - grade_book_path (str): The file path of the grade book to be updated.
+    - marks_dict (dict): A dictionary with student IDs as keys and their marks as values.
+    - assignment_index_list (list): The assessment indices returned by `generate_edx_marks`.
+    - iclicker_path (str): Path of the iClicker final grades; the sheet is skipped if it does not exist.
+
+    Requires:
+    - `grade_book_path` must be a valid path for writing.
+
+    Effects:
+    - Updates or creates a grade book at `grade_book_path` with sheets for each assignment.
+    - Stores a content hash per sheet in gradebook_hashes.json next to the grade book.
+
+    Note:
+    - If the grade book was modified since the hashes were stored (different mtime),
+      every sheet is rewritten.
+    - pandas is imported here rather than at module level, and only when at least one
+      sheet changed, so runs that skip the grade book never load the spreadsheet stack.
+    """
+    sheets = gradebook_sheets(marks_dict, assignment_index_list, iclicker_path)
+    sheet_hashes = {sheet_name: hashlib.sha1(json.dumps(sheets[sheet_name]).encode()).hexdigest()
+                    for sheet_name in sheets}
+
+    hashes_path = f"{os.path.splitext(grade_book_path)[0]}_hashes.json"
+    stored = {'mtime': None, 'sheets': {}}
+    if os.path.exists(hashes_path):
+        with open(hashes_path, mode='r') as infile:
+            stored = json.load(infile)
+    book_exists = os.path.exists(grade_book_path)
+    if not book_exists or stored['mtime'] != os.path.getmtime(grade_book_path):
+        stored['sheets'] = {}
+
+    changed_sheets = [sheet_name for sheet_name in sheets if stored['sheets'].get(sheet_name) != sheet_hashes[sheet_name]]
+    if changed_sheets == []:
+        print(">> gradebook.xlsx is up to date")
+        return
+
+    import pandas as pd
+
+    writer_mode = {'mode': 'a', 'if_sheet_exists': 'overlay'} if book_exists else {'mode': 'w'}
+    with pd.ExcelWriter(grade_book_path, engine='openpyxl', **writer_mode) as writer:
+        book = writer.book
+        for sheet_name in changed_sheets:
             if sheet_name in book.sheetnames:
                 del book[sheet_name]
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-    print(">> Generated gradebook.xlsx")
+            columns, rows = sheets[sheet_name]
+            pd.DataFrame(rows, columns=columns).to_excel(writer, sheet_name=sheet_name, index=False)
+
+    with open(hashes_path, mode='w') as outfile:
+        json.dump({'mtime': os.path.getmtime(grade_book_path), 'sheets': sheet_hashes}, outfile, indent=1)
+    print(f">> Generated gradebook.xlsx ({', '.join(changed_sheets)} updated)")
 
 
 def a0_pass_check(edx_marks_path: str, marks_dict: dict):
@@ -647,24 +924,313 @@ def a0_pass_check(edx_marks_path: str, marks_dict: dict):
                 writer.writerow([f'{uw_id}@uwaterloo.ca'])
     print(">> Generated a0_result.txt")
 
+
+def assessment_name(assessment_index: int):
+    """
+    Returns the name of an assessment index, as used in the edx_marks.csv header.
+
+    Parameters:
+    - assessment_index (int): The index of the assessment in the marks dictionary.
+
+    Returns:
+    - str: e.g. 'Assignment3', 'Assignment7Style', 'Midterm' or 'AStyle' (overall style).
+    """
+    if assessment_index < ASSIGNMENTS_NUM:
+        return f'Assignment{assessment_index}'
+    if assessment_index < MIDTERM_INDEX:
+        return f'Assignment{assessment_index - UNSTYLE_ASSIGNMENTS_NUM}Style'
+    if assessment_index == MIDTERM_INDEX:
+        return 'Midterm'
+    return 'AStyle'
+
+
+def export_marks_db(marks_db_path: str, marks_dict: dict, assignment_index_list: list):
+    """
+    Writes the generated marks to an indexed SQLite database.
+
+    Parameters:
+    - marks_db_path (str): The database file path; it is replaced atomically.
+    - marks_dict (dict): A dictionary with student IDs as keys and their finalized marks as values.
+    - assignment_index_list (list): The assessment indices returned by `generate_edx_marks`.
+
+    The database holds four tables, each indexed by student and by assessment:
+    - assessments(assessment, position): the assessments in edx_marks.csv order, plus AStyle.
+    - raw_marks(student, assessment, project, source, raw, remarked): marks as read
+      from the Marmoset/MarkUs/midterm files and after remarks.csv.
+    - parts(student, assessment, project, weighted, before_merge): weighted project
+      marks; before_merge is the on-time mark of projects merged with '-extended'.
+    - totals(student, assessment, total, exempt): the edx_marks.csv values, with
+      exempted assessments as a NULL total and exempt = 1.
+    """
+    temp_path = f"{marks_db_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    db = sqlite3.connect(temp_path)
+    db.executescript("""
+        create table assessments(assessment text primary key, position integer);
+        create table raw_marks(student text, assessment text, project text, source text, raw real, remarked real);
+        create table parts(student text, assessment text, project text, weighted real, before_merge real);
+        create table totals(student text, assessment text, total real, exempt integer,
+                            primary key (student, assessment));
+    """)
+
+    assessment_list = assignment_index_list + [OVERALL_STYLE]
+    db.executemany("insert into assessments values (?, ?)",
+                   [(assessment_name(i), position) for position, i in enumerate(assessment_list)])
+    for uw_id in marks_dict:
+        for i in assessment_list:
+            assessment = marks_dict[uw_id][i]
+            name = assessment_name(i)
+            db.executemany("insert into raw_marks values (?, ?, ?, ?, ?, ?)",
+                           [(uw_id, name, project, source, raw, remarked)
+                            for project, sources in assessment['raw'].items()
+                            for source, (raw, remarked) in sources.items()])
+            before_merge = assessment.get('before_merge', {})
+            db.executemany("insert into parts values (?, ?, ?, ?, ?)",
+                           [(uw_id, name, project, None if weighted == 'X' else weighted, before_merge.get(project))
+                            for project, weighted in assessment['assignment_part'].items()])
+            exempt = assessment['total'] == 'X'
+            db.execute("insert into totals values (?, ?, ?, ?)",
+                       (uw_id, name, None if exempt else round(assessment['total'], 5), int(exempt)))
+
+    db.executescript("""
+        create index raw_marks_student on raw_marks(student, assessment);
+        create index raw_marks_assessment on raw_marks(assessment);
+        create index parts_student on parts(student, assessment);
+        create index parts_assessment on parts(assessment);
+        create index totals_assessment on totals(assessment);
+    """)
+    db.commit()
+    db.close()
+    os.replace(temp_path, marks_db_path)
+    print(">> Generated edx_marks.sqlite")
+
+
+def load_previous_marks(edx_marks_path: str, log_dir: str):
+    """
+    Reads the edx_marks.csv of the previous run and moves it into the log folder as a backup.
+
+    Parameters:
+    - edx_marks_path (str): The edx_marks.csv path.
+    - log_dir (str): The log folder of this run.
+
+    Returns:
+    - tuple: The previous header and scores (see `edx_diff.parse_scores`), or None if
+      there is no previous edx_marks.csv.
+    """
+    if not os.path.exists(edx_marks_path):
+        return None
+    os.makedirs(log_dir, exist_ok=True)
+    with open(edx_marks_path, mode='r') as infile:
+        previous = parse_scores(infile)
+    os.replace(edx_marks_path, f"{log_dir}/edx_marks.csv")
+    return previous
+
+
+def diff_marks(diff_path: str, previous: tuple, marks_dict: dict, assignment_index_list: list):
+    """
+    Writes the marks that changed since the previous run, without reading edx_marks.csv back.
+
+    Parameters:
+    - diff_path (str): The diff log path.
+    - previous (tuple): The previous header and scores returned by `load_previous_marks`.
+    - marks_dict (dict): The finalized marks.
+    - assignment_index_list (list): The assessment indices returned by `generate_edx_marks`.
+
+    Returns:
+    - int: The number of changed marks.
+
+    Scores are compared as written in edx_marks.csv, with the same output as edx_diff.py.
+    """
+    headers_new = [''] + [assessment_name(i) for i in assignment_index_list]
+    new_scores = {uw_id: {assessment_name(i): 'X' if marks_dict[uw_id][i]['total'] == 'X'
+                          else str(round(marks_dict[uw_id][i]['total'], 5))
+                          for i in assignment_index_list}
+                  for uw_id in marks_dict}
+    lines = diff_scores(previous[0], previous[1], headers_new, new_scores, list(marks_dict))
+    with open(diff_path, mode='w') as outfile:
+        outfile.writelines(f"{line}\n" for line in lines)
+    return len(lines)
+
+
+def generate_term(term_data: str, gradebook: bool, full: bool = False, log_dir: str = ''):
+    """
+    Runs the whole generation pipeline for one term folder.
+
+    Parameters:
+    - term_data (str): The term folder.
+    - gradebook (bool): If False, gradebook.xlsx is not updated.
+    - full (bool): If True, the marks saved by the previous run are ignored.
+    - log_dir (str): If given, the previous edx_marks.csv is moved into it and the
+      changed marks are written to its diff.txt (see `diff_marks`).
+
+    Returns:
+    - dict: Summary of the run with 'students' and 'assessments' counts and the
+      per-stage 'metrics' (see `stage`).
+
+    Effects:
+    - Writes edx_marks.csv, edx_marks.sqlite, a0_result.txt and (optionally) gradebook.xlsx in `term_data`.
+    - Saves the finalized marks in log/marks_state.json. On the next run, students whose
+      inputs did not change (see `input_digests`) reuse them, so after classlist changes
+      only added students are processed and dropped ones disappear from the outputs.
+    """
+    paths = term_paths(term_data)
+    metrics = []
+    with stage(metrics, 'assignment_setup_reader') as record:
+        projects_info_dict, memory_questions_list, catalog = assignment_setup_reader(paths['config'])
+        record['rows'] = len(projects_info_dict)
+    with stage(metrics, 'load_result_dict') as record:
+        marks = load_result_dict(paths['classlist'])
+        record['rows'] = len(marks) - 1
+    with stage(metrics, 'load_results') as record:
+        # one scan of marmoset_result/marks.sqlite (or the CSV files of older terms)
+        marmoset_results = load_results(paths['marmoset_result'])
+        record['rows'] = sum(len(results) for results in marmoset_results.values())
+    with stage(metrics, 'input_digests') as record:
+        students = [uw_id for uw_id in marks if uw_id != 'mark_status']
+        state = load_marks_state(paths['marks_state'])
+        shared_digest, student_digests = input_digests(paths, students + list(state['students']), marmoset_results)
+        previous = state['students'] if state['shared'] == shared_digest and not full else {}
+        reused = {uw_id: previous[uw_id]['marks'] for uw_id in students
+                  if uw_id in previous and previous[uw_id]['digest'] == student_digests[uw_id]}
+        for uw_id in reused:
+            del marks[uw_id]
+        print(f">> Reusing marks of {len(reused)} students, processing {len(marks) - 1}")
+        record['rows'] = len(student_digests)
+    with stage(metrics, 'load_remarks_dict') as record:
+        remarks = load_remarks_dict(paths['remark'])
+        record['rows'] = sum(len(remarks[question]) for question in remarks)
+    with stage(metrics, 'process_marks') as record:
+        process_marks(projects_info_dict,
+                      memory_questions_list,
+                      catalog,
+                      marks,
+                      remarks,
+                      marmoset_results,
+                      paths['markus_result'],
+                      paths['midterm_result'],
+                      paths['exemption'])
+        record['rows'] = sum(len(assessment['assignment_part'])
+                             for uw_id in marks if uw_id != 'mark_status'
+                             for assessment in marks[uw_id])
+    with stage(metrics, 'finalize_marks') as record:
+        finalize_marks(marks)
+        record['rows'] = len(marks) - 1
+        marks.update(reused)
+        marks = {uw_id: marks[uw_id] for uw_id in ['mark_status'] + students}
+        save_marks_state(paths['marks_state'], shared_digest, student_digests, marks)
+    if log_dir:
+        with stage(metrics, 'load_previous_marks') as record:
+            previous = load_previous_marks(paths['edx_marks'], log_dir)
+            record['rows'] = len(previous[1]) if previous else 0
+    with stage(metrics, 'generate_edx_marks (csv)') as record:
+        assignment_index_list = generate_edx_marks(paths['edx_marks'], marks)
+        record['rows'] = len(marks)
+    if log_dir and previous:
+        with stage(metrics, 'diff_marks') as record:
+            record['rows'] = diff_marks(f"{log_dir}/diff.txt", previous, marks, assignment_index_list)
+    if gradebook:
+        with stage(metrics, 'generate_edx_marks (gradebook)') as record:
+            generate_gradebook(paths['gradebook'], marks, assignment_index_list, paths['iclicker'])
+            record['rows'] = len(marks)
+    with stage(metrics, 'export_marks_db') as record:
+        export_marks_db(paths['marks_db'], marks, assignment_index_list)
+        record['rows'] = len(marks)
+    with stage(metrics, 'a0_pass_check') as record:
+        a0_pass_check(paths['a0_result'], marks)
+        record['rows'] = len(marks)
+    return {'students': len(marks), 'assessments': len(assignment_index_list), 'metrics': metrics}
+
+
+def batch_worker(term_data: str, gradebook: bool, full: bool, metrics_path: str = ''):
+    """
+    Worker process of `batch_generate`: generates one term and reports how it went.
+
+    Parameters:
+    - term_data (str): The term folder.
+    - gradebook (bool): If False, gradebook.xlsx is not updated.
+    - full (bool): If True, every student is recomputed.
+    - metrics_path (str): If given, the metrics of the term are written to this JSON file
+      (see `write_metrics`).
+
+    Returns:
+    - dict: The `generate_term` summary plus 'term', 'seconds' and 'error' (None on success).
+    """
+    start_time = time.time()
+    if metrics_path and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    try:
+        summary = generate_term(term_data, gradebook, full)
+        if metrics_path:
+            write_metrics(metrics_path, term_data, gradebook, summary['metrics'])
+        summary['error'] = None
+    except Exception as error:
+        summary = {'error': f"{type(error).__name__}: {error}"}
+    summary['term'] = os.path.basename(term_data)
+    summary['seconds'] = time.time() - start_time
+    return summary
+
+
+def batch_generate(term_folders: list, gradebook: bool, full: bool = False, metrics_name: str = ''):
+    """
+    Regenerates several term folders in parallel worker processes and prints a combined summary.
+
+    Parameters:
+    - term_folders (list): The term folders to regenerate.
+    - gradebook (bool): If False, gradebook.xlsx is not updated.
+    - full (bool): If True, every student is recomputed.
+    - metrics_name (str): If given, the metrics of each term are written to
+      [term]/log/<timestamp>/[metrics_name], where `edx -p` finds them.
+
+    Returns:
+    - bool: True if every term was generated successfully.
+    """
+    run_name = datetime.today().strftime('%Y%m%d_%H%M%S')
+    metrics_paths = [f"{term_data}/log/{run_name}/{metrics_name}" if metrics_name else '' for term_data in term_folders]
+    workers = min(len(term_folders), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        summaries = list(executor.map(batch_worker, term_folders, [gradebook] * len(term_folders),
+                                      [full] * len(term_folders), metrics_paths))
+
+    print(">> Batch summary")
+    for summary in summaries:
+        if summary['error'] is None:
+            print(f"   |> {summary['term']}: {summary['students']} students, "
+                  f"{summary['assessments']} assessments, {summary['seconds']:.1f}s")
+        else:
+            print(f"   |> {summary['term']}: FAILED ({summary['error']})")
+    return all(summary['error'] is None for summary in summaries)
+
 # ====================================================================
 # Start of main program
 # ====================================================================
 
 def main():
-    projects_info_dict, memory_questions_list = assignment_setup_reader(PATH_CONFIG)
-    marks = load_result_dict(PATH_CLASSLIST)
-    remarks = load_remarks_dict(PATH_REMARK)
-    process_marks(projects_info_dict,
-                  memory_questions_list,
-                  marks,
-                  remarks,
-                  PATH_MARMOSET_RESULT,
-                  PATH_MARKUS_RESULT,
-                  PATH_MIDTERM_RESULT)
-    finalize_marks(marks)
-    generate_edx_marks(PATH_EDX_MARKS, PATH_GRADEBOOK, marks)
-    a0_pass_check(PATH_A0_RESULT, marks)
-
-
-main()
+    parser = argparse.ArgumentParser(description="Generate edx_marks.csv and the grade book for the current term.")
+    parser.add_argument('--no-gradebook', action='store_true',
+                        help="only write edx_marks.csv and a0_result.txt, without loading pandas/openpyxl")
+    parser.add_argument('--metrics', default='',
+                        help="write per-stage timing, peak allocations and row counts of the run, and its peak memory, to this JSON file; "
+                             "with terms, each term's metrics are written to log/<timestamp>/ of that term under this file name")
+    parser.add_argument('--log-dir', default='',
+                        help="move the previous edx_marks.csv into this folder and write the changed marks to its diff.txt")
+    parser.add_argument('--full', action='store_true',
+                        help="recompute every student instead of reusing unchanged marks of the previous run")
+    parser.add_argument('terms', nargs='*',
+                        help="term folders under ~/marks/past_terms to regenerate in parallel (default: current term)")
+    args = parser.parse_args()
+
+    if args.terms:
+        if not batch_generate([resolve_term(term) for term in args.terms], not args.no_gradebook, args.full,
+                              os.path.basename(args.metrics)):
+            sys.exit(1)
+    else:
+        if args.metrics:
+            tracemalloc.start()
+        summary = generate_term(PATH_TERM_DATA, not args.no_gradebook, args.full, args.log_dir)
+        if args.metrics:
+            write_metrics(args.metrics, PATH_TERM_DATA, not args.no_gradebook, summary['metrics'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+## =======================================================
+## Program: edX Student Marks Lookup (edx_lookup)
+## Created Time: 2026-10-19
+## Company: University of Waterloo
+## Department: School of Computer Science
+## =======================================================
+
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime
+
+# ====================================================================
+# Helper Functions
+# ====================================================================
+
+def normalize_assessment(assessment: str):
+    """
+    Turns a short assessment name into the name used in edx_marks.csv.
+
+    Parameters:
+    - assessment (str): e.g. 'a5', 'A5Style', 'assignment5' or 'midterm'.
+
+    Returns:
+    - str: e.g. 'Assignment5', 'Assignment5Style' or 'midterm' (compared case-insensitively).
+    """
+    return re.sub(r'^a(ssignment)?(\d+)', r'Assignment\2', assessment, flags=re.IGNORECASE)
+
+
+def format_mark(value):
+    return '-' if value is None else f'{value:g}'
+
+# ====================================================================
+# Functions
+# ====================================================================
+
+def lookup(marks_db_path: str, uw_id: str, assessment: str = ''):
+    """
+    Prints the full mark breakdown of one student from the database written by `edx -g`.
+
+    Parameters:
+    - marks_db_path (str): Path of edx_marks.sqlite.
+    - uw_id (str): The student's university ID.
+    - assessment (str): Optional assessment to show (e.g. 'a5'); all by default.
+
+    For every assessment it prints the weighted total (or EXEMPT), and for every
+    project the raw Marmoset/MarkUs/midterm mark, the remark applied, the weighted
+    mark and the on-time mark when it was merged with an extended project.
+    """
+    if not os.path.exists(marks_db_path):
+        print(f"{marks_db_path} not found, run [edx -g] first")
+        sys.exit(1)
+    db = sqlite3.connect(marks_db_path)
+
+    query = """select t.assessment, t.total, t.exempt from totals t join assessments a on a.assessment = t.assessment
+               where t.student = ?"""
+    params = [uw_id]
+    if assessment:
+        query += " and lower(t.assessment) = lower(?)"
+        params.append(normalize_assessment(assessment))
+    totals = db.execute(query + " order by a.position", params).fetchall()
+    if totals == []:
+        print(f"No marks for {uw_id}" + (f" in {assessment}" if assessment else ""))
+        db.close()
+        sys.exit(1)
+
+    updated = datetime.fromtimestamp(os.path.getmtime(marks_db_path)).strftime('%Y-%m-%d %H:%M')
+    print(f"{uw_id} (marks generated {updated})")
+    for name, total, exempt in totals:
+        print(f"[{name}] total: {'EXEMPT' if exempt else format_mark(total)}")
+
+        raw_marks = {}
+        for project, source, raw, remarked in db.execute(
+                "select project, source, raw, remarked from raw_marks where student = ? and assessment = ?", (uw_id, name)):
+            text = f"{source} {format_mark(raw)}"
+            if remarked != raw:
+                text += f" -> remark {format_mark(remarked)}"
+            raw_marks.setdefault(project, []).append(text)
+
+        for project, weighted, before_merge in db.execute(
+                "select project, weighted, before_merge from parts where student = ? and assessment = ? order by project",
+                (uw_id, name)):
+            line = f"   |> {project}: "
+            if project in raw_marks:
+                line += ', '.join(raw_marks[project]) + ', '
+            line += f"weighted {'EXEMPT' if weighted is None else format_mark(weighted)}"
+            if before_merge is not None:
+                line += f" (on-time {format_mark(before_merge)}, merged with extended)"
+            print(line)
+    db.close()
+
+# ====================================================================
+# Start of main program
+# ====================================================================
+
+def main():
+    if len(sys.argv) in (3, 4):
+        marks_db_path = sys.argv[1]
+        uw_id = sys.argv[2]
+        assessment = sys.argv[3] if len(sys.argv) == 4 else ''
+        lookup(marks_db_path, uw_id, assessment)
+    else:
+        print("Usage: MARKS_DB_PATH, STUDENT, [ASSESSMENT]")
+        sys.exit(1)
+
+
+main()
@@ -0,0 +1,121 @@
+## =======================================================
+## Program: edX Run Metrics Comparison (edx_metrics)
+## Created Time: 2026-10-19
+## Company: University of Waterloo
+## Department: School of Computer Science
+## =======================================================
+
+import json
+import os
+import sys
+
+# ====================================================================
+# FOLLOWING IS METRICS SETUP
+# ====================================================================
+# Number of runs compared by default
+DEFAULT_RUNS = 5
+
+# A stage slower than the previous run by more than this ratio is flagged
+REGRESSION_RATIO = 1.5
+
+# ====================================================================
+# Functions
+# ====================================================================
+
+def load_runs(log_path: str, count: int):
+    """
+    Loads the metrics of the most recent `edx -g` runs.
+
+    Parameters:
+    - log_path (str): The term log folder containing one <timestamp> folder per run.
+    - count (int): The number of runs to load.
+
+    Returns:
+    - list: (run_name, metrics) tuples, oldest first.
+    """
+    runs = []
+    if os.path.isdir(log_path):
+        for run_name in sorted(os.listdir(log_path)):
+            metrics_path = f'{log_path}/{run_name}/metrics.json'
+            if os.path.isfile(metrics_path):
+                with open(metrics_path, mode='r') as infile:
+                    runs.append((run_name, json.load(infile)))
+    return runs[-count:]
+
+
+def stage_value(metrics: dict, stage: str, key: str):
+    """
+    Returns one value of a stage record of a run, or None if the run has no such stage.
+
+    Parameters:
+    - metrics (dict): The metrics of one run.
+    - stage (str): The stage name.
+    - key (str): The record key, e.g. 'seconds' or 'rows'.
+    """
+    for record in metrics['stages']:
+        if record['stage'] == stage:
+            return record[key]
+    return None
+
+
+def compare_runs(runs: list):
+    """
+    Prints a table of per-stage seconds for each run, then the totals, peak memory
+    and class size. Stages slower than REGRESSION_RATIO times the previous run are
+    marked with '!'.
+
+    Parameters:
+    - runs (list): (run_name, metrics) tuples as returned by `load_runs`.
+    """
+    stages = []
+    for _, metrics in runs:
+        for record in metrics['stages']:
+            if record['stage'] not in stages:
+                stages.append(record['stage'])
+
+    width = max(len(stage) for stage in stages + ['peak rss (MB)'])
+    print(f"{'':<{width}}" + ''.join(f"  {run_name:>16}" for run_name, _ in runs))
+
+    for stage in stages + ['total']:
+        line = f"{stage:<{width}}"
+        previous = None
+        for _, metrics in runs:
+            if stage == 'total':
+                seconds = metrics['total_seconds']
+            else:
+                seconds = stage_value(metrics, stage, 'seconds')
+            flag = '!' if previous and seconds and seconds > previous * REGRESSION_RATIO else ' '
+            line += f"  {'-' if seconds is None else f'{seconds:.3f}s':>15}{flag}"
+            previous = seconds
+        print(line)
+
+    line = f"{'peak rss (MB)':<{width}}"
+    for _, metrics in runs:
+        line += f"  {metrics['peak_rss_kb'] / 1024:>15.1f} "
+    print(line)
+
+    line = f"{'students':<{width}}"
+    for _, metrics in runs:
+        students = stage_value(metrics, 'load_result_dict', 'rows')
+        line += f"  {'-' if students is None else students:>15} "
+    print(line)
+
+# ====================================================================
+# Start of main program
+# ====================================================================
+
+def main():
+    if len(sys.argv) in (2, 3):
+        log_path = sys.argv[1]
+        count = int(sys.argv[2]) if len(sys.argv) == 3 else DEFAULT_RUNS
+        runs = load_runs(log_path, count)
+        if runs:
+            compare_runs(runs)
+        else:
+            print(f"No run metrics found in {log_path}")
+    else:
+        print("Usage: LOG_PATH, [NUMBER_OF_RUNS]")
+        sys.exit(1)
+
+
+main()
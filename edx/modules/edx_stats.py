@@ -0,0 +1,197 @@
+## =======================================================
+## Program: edX Marks Statistics (edx_stats)
+## Created Time: 2026-10-19
+## Company: University of Waterloo
+## Department: School of Computer Science
+## =======================================================
+
+import hashlib
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'common'))
+from results_store import CSV_PREFIX, CSV_SUFFIX, load_results, store_path
+
+# ====================================================================
+# FOLLOWING IS STATS SETUP
+# ====================================================================
+# Bump when the report format changes so old cache entries are not reused
+STATS_VERSION = 1
+
+# Histogram bins, as a percentage of the assessment full marks
+HISTOGRAM_BINS = list(range(0, 101, 10))
+
+# Number of cached reports kept in the cache folder
+CACHE_SIZE = 10
+
+# ====================================================================
+# Helper Functions
+# ====================================================================
+
+def marmoset_inputs(marmoset_result: str):
+    """
+    Lists the files holding the Marmoset marks of a folder.
+
+    Parameters:
+    - marmoset_result (str): Directory path containing Marmoset results.
+
+    Returns:
+    - list: The results store (marks.sqlite) if there is one, otherwise every
+      project-*-grades.csv file (older terms), sorted.
+    """
+    if os.path.exists(store_path(marmoset_result)):
+        return [store_path(marmoset_result)]
+    if not os.path.isdir(marmoset_result):
+        return []
+    return [f'{marmoset_result}/{file}' for file in sorted(os.listdir(marmoset_result))
+            if file.startswith(CSV_PREFIX) and file.endswith(CSV_SUFFIX)]
+
+
+def inputs_hash(paths: list):
+    """
+    Computes a hash of the name and content of every input file.
+
+    Parameters:
+    - paths (list): The input file paths; missing files are hashed as absent.
+
+    Returns:
+    - str: A hex digest identifying this exact set of inputs.
+    """
+    digest = hashlib.sha1(f'stats-v{STATS_VERSION}'.encode())
+    for path in paths:
+        digest.update(path.encode())
+        if os.path.exists(path):
+            with open(path, mode='rb') as infile:
+                digest.update(infile.read())
+        else:
+            digest.update(b'\0missing')
+    return digest.hexdigest()
+
+
+def summarize(marks, percent):
+    """
+    Computes distribution statistics per assessment.
+
+    Parameters:
+    - marks (DataFrame): Long frame with 'assessment' and 'mark' columns; missing marks are NaN.
+    - percent (Series): Each mark as a percentage of the assessment full marks.
+
+    Returns:
+    - tuple: (summary, histogram) DataFrames indexed by assessment.
+    """
+    import pandas as pd
+
+    grouped = marks.groupby('assessment', sort=False)['mark']
+    summary = pd.DataFrame({
+        'count': grouped.count(),
+        'missing': marks['mark'].isna().groupby(marks['assessment'], sort=False).sum(),
+        'zeros': (marks['mark'] == 0).groupby(marks['assessment'], sort=False).sum(),
+        'mean': grouped.mean(),
+        'std': grouped.std(),
+        'min': grouped.min(),
+        'q25': grouped.quantile(0.25),
+        'median': grouped.median(),
+        'q75': grouped.quantile(0.75),
+        'max': grouped.max(),
+    }).round(2)
+
+    bins = pd.cut(percent.clip(0, 100), HISTOGRAM_BINS, include_lowest=True)
+    histogram = pd.crosstab(marks['assessment'], bins).reindex(index=summary.index, columns=bins.cat.categories, fill_value=0)
+    histogram.columns = [f'{int(interval.left)}-{int(interval.right)}' for interval in histogram.columns]
+    return summary, histogram
+
+# ====================================================================
+# Functions
+# ====================================================================
+
+def generate_stats(marmoset_result: str, edx_marks_path: str):
+    """
+    Builds the statistics report for the Marmoset results and edx_marks.csv.
+
+    Parameters:
+    - marmoset_result (str): Directory path containing Marmoset results.
+    - edx_marks_path (str): Path of the generated edx_marks.csv.
+
+    Returns:
+    - str: The report text.
+
+    Marmoset histograms are relative to the highest mark of each project, edx
+    histograms to 100. Exempted ('X') edx marks are counted as missing.
+    """
+    import pandas as pd
+
+    report = []
+    frames = []
+    for project_name, results in load_results(marmoset_result).items():
+        frame = pd.DataFrame(results, columns=['student', 'mark'])
+        frame['assessment'] = project_name
+        frames.append(frame)
+    if frames:
+        marks = pd.concat(frames, ignore_index=True)
+        marks['mark'] = pd.to_numeric(marks['mark'], errors='coerce')
+        full_marks = marks.groupby('assessment')['mark'].transform('max')
+        summary, histogram = summarize(marks, marks['mark'] / full_marks.where(full_marks > 0) * 100)
+        report += ['# Marmoset projects', summary.to_string(), '',
+                   '# Marmoset histograms (% of highest mark)', histogram.to_string(), '']
+
+    if os.path.exists(edx_marks_path):
+        edx_marks = pd.read_csv(edx_marks_path, index_col=0, dtype=str)
+        marks = edx_marks.melt(var_name='assessment', value_name='mark')
+        exempt = (marks['mark'] == 'X').groupby(marks['assessment'], sort=False).sum()
+        marks['mark'] = pd.to_numeric(marks['mark'], errors='coerce')
+        summary, histogram = summarize(marks, marks['mark'])
+        summary.insert(1, 'exempt', exempt)
+        report += ['# edX assessments', summary.to_string(), '',
+                   '# edX histograms (%)', histogram.to_string(), '']
+
+    return '\n'.join(report)
+
+
+def cached_stats(marmoset_result: str, edx_marks_path: str, cache_folder: str):
+    """
+    Returns the statistics report, reusing a cached report when the inputs are unchanged.
+
+    Parameters:
+    - marmoset_result (str): Directory path containing Marmoset results.
+    - edx_marks_path (str): Path of the generated edx_marks.csv.
+    - cache_folder (str): Folder storing reports as {inputs hash}.txt.
+
+    Returns:
+    - str: The report text.
+
+    Note:
+    - pandas is only imported on a cache miss.
+    - Only the CACHE_SIZE most recent reports are kept.
+    """
+    paths = marmoset_inputs(marmoset_result) + [edx_marks_path]
+    cache_path = f'{cache_folder}/{inputs_hash(paths)}.txt'
+    if os.path.exists(cache_path):
+        with open(cache_path, mode='r') as infile:
+            return infile.read()
+
+    report = generate_stats(marmoset_result, edx_marks_path)
+    os.makedirs(cache_folder, exist_ok=True)
+    with open(cache_path, mode='w') as outfile:
+        outfile.write(report)
+
+    cached = sorted((f'{cache_folder}/{file}' for file in os.listdir(cache_folder)), key=os.path.getmtime)
+    for old_path in cached[:-CACHE_SIZE]:
+        os.remove(old_path)
+    return report
+
+# ====================================================================
+# Start of main program
+# ====================================================================
+
+def main():
+    if len(sys.argv) == 4:
+        marmoset_result = sys.argv[1]
+        edx_marks_path = sys.argv[2]
+        cache_folder = sys.argv[3]
+        print(cached_stats(marmoset_result, edx_marks_path, cache_folder))
+    else:
+        print("Usage: MARMOSET_RESULT_PATH, EDX_MARKS_PATH, CACHE_PATH")
+        sys.exit(1)
+
+
+main()
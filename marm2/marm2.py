@@ -10,6 +10,7 @@
 ## =======================================================
 
 import csv
+import json
 import os
 import getpass
 import subprocess
@@ -18,6 +19,18 @@ import sys
 import pymysql
 from pymysql.cursors import Cursor
 import re
+import threading
+import time
+import shutil
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import fnmatch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'common'))
+from project_catalog import build_catalog, parse_project
+import results_store
+import snapshot
 
 # ====================================================================
 # FOLLOWING IS ASSIGNMENT SETUP
@@ -27,6 +40,31 @@ GRACE_PERIOD = 1  # MINUTES
 
 VALID_TYPE = ['a', 'lab']
 
+# Maximum size of downloaded archives waiting to be written to disk
+DOWNLOAD_BUFFER_SIZE = 64 * 1024 * 1024  # BYTES
+
+# Size of each ranged read of a submission archive
+ARCHIVE_CHUNK_SIZE = 4 * 1024 * 1024  # BYTES
+
+# Submissions per bulk test outcome query
+OUTCOMES_BATCH_SIZE = 1000
+
+# Submissions per page when reading a project's submissions (keyset pagination)
+SUBMISSIONS_PAGE_SIZE = 5000
+
+# Seconds between two updates of the live progress line (-v) and of the JSON progress records (-j)
+PROGRESS_INTERVAL = 0.2  # SECONDS
+PROGRESS_JSON_INTERVAL = 30  # SECONDS
+
+MEGABYTE = 1024 * 1024  # BYTES
+
+# EXPLAIN columns printed by --plan (all columns are printed if the server returns none of these)
+PLAN_COLUMNS = ['table', 'type', 'possible_keys', 'key', 'rows', 'filtered', 'Extra']
+
+# Folder of the extraction manifests (one [proj].json per project) in the extract destination,
+# records the archive each [proj]/[userid] folder came from
+EXTRACT_MANIFESTS = ".marm2_extracted"
+
 # ====================================================================
 # FOLLOWING IS ENV VARIABLES
 # ====================================================================
@@ -84,6 +122,62 @@ def get_student_list(classlist_file: str):
     return studentList
 
 
+def status_print(message: str, verbose: int):
+    """
+    Prints a status line. In machine-readable mode (verbose 2) it goes to stderr, so
+    stdout only carries the JSON records of `Progress`.
+    """
+    print(message, file=sys.stderr if int(verbose) == 2 else sys.stdout, flush=True)
+
+
+def load_extensions(extensions_file: str):
+    """
+    Reads a deadline extensions file.
+
+    Parameters:
+    - extensions_file (str): The file path to the extensions file.
+
+    Returns:
+    - dict: Maps (student, project) to the extension in minutes. The project is kept
+      lower-case and may be a project (a5p3) or a whole assignment (a5).
+
+    The file is a CSV with a header 'student,project,minutes'. Lines starting with '#'
+    are ignored.
+
+    Example:
+    extensions = load_extensions("path/to/extensions.csv")
+    """
+    extensions = {}
+    with open(extensions_file, mode='r') as infile:
+        reader = csv.DictReader(line for line in infile if not line.strip().startswith('#'))
+        for row in reader:
+            if row['student'] and row['project'] and row['minutes']:
+                extensions[(row['student'].strip(), row['project'].strip().lower())] = float(row['minutes'])
+    return extensions
+
+
+def project_extensions(extensions: dict, project_name: str):
+    """
+    Selects the extensions that apply to one project.
+
+    Parameters:
+    - extensions (dict): The extensions returned by `load_extensions`.
+    - project_name (str): The project name.
+
+    Returns:
+    - dict: Maps each student with an extension on this project to a timedelta. An entry
+      for the project itself, its on-time project (for -extended projects) or its whole
+      assignment applies; the largest one wins.
+    """
+    project = parse_project(project_name)
+    keys = {project.name.lower(), project.base.lower(), f"{project.type}{project.assignment}"}
+    result = {}
+    for (uw_id, key), minutes in extensions.items():
+        if key in keys:
+            result[uw_id] = max(result.get(uw_id, timedelta(0)), timedelta(minutes=minutes))
+    return result
+
+
 def load_db_info(db_info: str):
     """
     Loads database connection information from a file.
@@ -147,6 +241,25 @@ def sql_execute(cursor: Cursor, cmd: str):
     return result
 
 
+def db_connect():
+    """
+    Opens a connection to the Marmoset database.
+
+    Returns:
+    - tuple: The database connection and a DictCursor on it.
+
+    Example:
+    db, cursor = db_connect()
+    """
+    host_name, db_name, user_name, user_password = load_db_info(PATH_DB_INFO)
+    db = pymysql.connect(host=host_name,
+                        user=user_name,
+                        password=user_password,
+                        database=db_name,
+                        cursorclass=pymysql.cursors.DictCursor)
+    return db, db.cursor()
+
+
 def db_init(assn: str):
     """
     Initializes the database connection and retrieves specific project information.
@@ -162,28 +275,69 @@ def db_init(assn: str):
     based on the provided assignment identifier. The function returns the database connection
     and cursor along with the retrieved project and student registration information.
 
-    If the course, project, or student registration information cannot be found, the function
-    will close the database connection and exit.
+    If the course or student registration information cannot be found, the function will
+    close the database connection and exit with an error. If no project matches yet (e.g. the
+    assignment is not released), it exits successfully, as there is nothing to do.
 
     Example:
     db, cursor, projects, student_reg = db_init("a")
     """
-    now = datetime.today().strftime('%Y-%m-%d %H:%M:%S')
+    db, cursor = db_connect()
 
-    host_name, db_name, user_name, user_password = load_db_info(PATH_DB_INFO)
-    db = pymysql.connect(host=host_name,
-                        user=user_name,
-                        password=user_password,
-                        database=db_name,
-                        cursorclass=pymysql.cursors.DictCursor)
-    cursor = db.cursor()
+    course_pk = sql_execute(cursor, course_query())
+    projects = sql_execute(cursor, projects_query(assn, course_pk))
+    student_reg_pk = sql_execute(cursor, students_query(course_pk))
 
-    course_pk_query = f"select course_pk from courses where semester ='{CURRTERM}' and coursename='{COURSENAME}'"
-    course_pk = sql_execute(cursor, course_pk_query)
-    
+    if course_pk == [] or student_reg_pk == []:
+        db.close()
+        exit(1)
+    elif projects == []:
+        print(f"No project matches {assn}", file=sys.stderr)
+        db.close()
+        exit(0)
+    else:
+        return db, cursor, projects, student_reg_pk
+
+
+def course_query():
+    """
+    Returns the query of the course_pk of this course in the current term.
+    """
+    return f"select course_pk from courses where semester ='{CURRTERM}' and coursename='{COURSENAME}'"
+
+
+def students_query(course_pk: int):
+    """
+    Returns the query of the userid and student_registration_pk of every student of a course.
+    """
+    return f"""select cvs_account, student_registration_pk from student_registration where course_pk='{course_pk}'"""
+
+
+def course_projects_query(course_pk: int):
+    """
+    Returns the query of every project of a course, whatever its deadline.
+    """
+    return f"""select project_pk, project_number, ontime from projects where course_pk = '{course_pk}'"""
+
+
+def projects_query(assn: str, course_pk: int):
+    """
+    Returns the query of the projects matched by an assignment identifier (see `db_init`).
+
+    Parameters:
+    - assn (str): The assignment identifier ('a', 'u', 'c', a number, Ax or a regex).
+    - course_pk (int): The course primary key.
+
+    Returns:
+    - str: A query selecting project_pk, project_number and ontime.
+    """
+    now = datetime.today().strftime('%Y-%m-%d %H:%M:%S')
     if assn == 'a':
         project_pk_query = f"""select project_pk, project_number, ontime from projects where 
                            course_pk ='{course_pk}' and ontime < '{now}'"""
+    elif assn == 'u':
+        project_pk_query = f"""select project_pk, project_number, ontime from projects where 
+                           course_pk ='{course_pk}' and ontime >= '{now}' order by ontime"""
     elif assn == 'c':
         project_pk_query = f"""select project_pk, project_number, ontime 
                                     from projects 
@@ -201,112 +355,643 @@ def db_init(assn: str):
             project_pk_query = f"select project_pk, project_number, ontime from projects where course_pk = '{course_pk}' and project_number regexp '^{assn}[PBQ].*';"
         else:
             project_pk_query = f"select project_pk, project_number, ontime from projects where course_pk = '{course_pk}' and project_number regexp '{assn}';"
+    return project_pk_query
 
-    projects = sql_execute(cursor, project_pk_query)
 
-    student_reg_pk_query = f"""select cvs_account, student_registration_pk from student_registration where course_pk='{course_pk}'"""
-    student_reg_pk = sql_execute(cursor, student_reg_pk_query)
+def select_projects(assn: str, projects: list):
+    """
+    Resolves an assignment identifier against a list of projects, with the same
+    rules as the queries built by `db_init`.
 
-    if course_pk == [] or projects == [] or student_reg_pk == []:
-        db.close()
-        exit(1)
+    Parameters:
+    - assn (str): The assignment identifier ('a', 'c', 'u', a number, Ax or a regex).
+    - projects (list): Project dicts with 'project_pk', 'project_number' and 'ontime'.
+
+    Returns:
+    - list: The matching projects.
+
+    Example:
+    projects = select_projects("7", all_projects)
+    """
+    now = datetime.today()
+    if assn == 'a':
+        return [project for project in projects if project['ontime'] < now]
+    if assn == 'u':
+        return sorted((project for project in projects if project['ontime'] >= now), key=lambda x: x['ontime'])
+    if assn == 'c':
+        past = [project['ontime'] for project in projects if project['ontime'] < now]
+        return [project for project in projects if past and project['ontime'] == max(past)]
+
+    assn = assn.upper()
+    if re.search('^[0-9]+$', assn):
+        pattern = f'^(A|LAB){assn}[PBQ].*'
+    elif re.search('^((A|LAB)[0-9]+)$', assn):
+        pattern = f'^{assn}[PBQ].*'
     else:
-        return db, cursor, projects, student_reg_pk
+        pattern = assn
+    return [project for project in projects if re.search(pattern, project['project_number'], re.IGNORECASE)]
+
+
+def snapshot_init(assn: str, snapshot_path: str, check_untested: bool = True):
+    """
+    Offline counterpart of `db_init`: retrieves the project, student registration and
+    submission information of an assignment from a local snapshot.
+
+    Parameters:
+    - assn (str): The assignment identifier.
+    - snapshot_path (str): The snapshot file written by `update_snapshot`.
+    - check_untested (bool): If True, the function exits when a matching project past its
+      deadline has submissions that were not tested yet when the snapshot was refreshed,
+      since their marks would count as 0.
+
+    Returns:
+    - tuple: The projects, the student registration information, the submissions of
+      each project (project_pk -> rows) and the full marks of each project (project_pk -> outof).
+
+    If the snapshot has no students, the function exits with an error; if no project matches,
+    it exits successfully, like `db_init`.
+
+    Example:
+    projects, student_reg, submissions, outofs = snapshot_init("a", "submissions.snap")
+    """
+    meta, columns = snapshot.read_snapshot(snapshot_path)
+    all_projects = [{'project_pk': project['project_pk'],
+                     'project_number': project['project_number'],
+                     'ontime': datetime.fromisoformat(project['ontime'])} for project in meta['projects']]
+    projects = select_projects(assn, sorted(all_projects, key=lambda x: x['project_pk']))
+    student_reg_pk = meta['students']
+
+    if student_reg_pk == []:
+        exit(1)
+    elif projects == []:
+        print(f"No project matches {assn}", file=sys.stderr)
+        exit(0)
+
+    if check_untested:
+        untested = {}
+        for submission_pk, project_pk in meta['untested']:
+            untested[project_pk] = untested.get(project_pk, 0) + 1
+        pending = [project for project in projects
+                   if project['project_pk'] in untested and project['ontime'] < datetime.today()]
+        for project in pending:
+            print(f"{project['project_number']}: {untested[project['project_pk']]} submissions were not tested yet "
+                  f"in the snapshot; refresh it with -S or run without -l")
+        if pending:
+            exit(1)
+
+    project_pks = {project['project_pk'] for project in projects}
+    submissions = snapshot.group_submissions(columns, project_pks)
+    outofs = {project['project_pk']: project['outof'] for project in meta['projects']}
+    return projects, student_reg_pk, submissions, outofs
+
+
+def project_outof(cursor: Cursor, proj_pk: int):
+    """
+    Fetches the total points of the active test setup of a project, excluding 'build' tests.
+
+    Parameters:
+    - cursor (Cursor): The database cursor.
+    - proj_pk (int): The project primary key.
+
+    Returns:
+    - The total points, or an empty list if the project has no active test setup.
+    """
+    test_run_pk_query = f"""select test_run_pk from project_jarfiles where project_pk = '{proj_pk}' and jarfile_status='active';"""
+    test_run_pk = sql_execute(cursor, test_run_pk_query)
+
+    outof_query = f"""select sum(point_value) from test_outcomes where test_type <> 'build' and test_run_pk = '{test_run_pk}';"""
+    return sql_execute(cursor, outof_query)
+
+
+class ByteQueue:
+    """
+    A FIFO queue bounded by the total size in bytes of the items it holds, rather
+    than by the number of items.
+
+    `put` blocks while adding the item would exceed `max_bytes`. An item larger
+    than `max_bytes` is still accepted once the queue is empty, so a single huge
+    archive cannot deadlock the pipeline.
+
+    Example:
+    queue = ByteQueue(DOWNLOAD_BUFFER_SIZE)
+    queue.put(("a1p1/student.zip", chunk, True, start_time), len(chunk))
+    path, chunk, is_last, start_time = queue.get()
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.items = deque()
+        self.condition = threading.Condition()
+
+    def put(self, item, nbytes: int):
+        with self.condition:
+            while self.items and self.size + nbytes > self.max_bytes:
+                self.condition.wait()
+            self.items.append((item, nbytes))
+            self.size += nbytes
+            self.condition.notify_all()
+
+    def get(self):
+        with self.condition:
+            while not self.items:
+                self.condition.wait()
+            item, nbytes = self.items.popleft()
+            self.size -= nbytes
+            self.condition.notify_all()
+            return item
+
+
+class Progress:
+    """
+    Progress and throughput of a long-running operation (marks or download), one project at a time.
+
+    Parameters:
+    - operation (str): Name of the operation, e.g. "marks" or "download".
+    - verbose (int): 0 prints one line per project, 1 adds a live line with the rate and ETA
+      and a summary table at the end, 2 (machine-readable, for cron logs) prints JSON lines
+      instead: a "progress" record every PROGRESS_JSON_INTERVAL seconds, a "project" record
+      when a project is done and a "summary" record at the end.
+
+    Example:
+    progress = Progress("download", verbose)
+    progress.start_project("a1p1", len(student_list))
+    progress.step(archive_bytes)
+    progress.end_project()
+    progress.finish()
+    """
+    def __init__(self, operation: str, verbose: int):
+        self.operation = operation
+        self.verbose = int(verbose)
+        self.projects = []
+        self.project = None
+        self.last_report = 0
+        self.line_width = 0
+
+    def start_project(self, project_name: str, total: int):
+        self.project = {'project': project_name, 'students': 0, 'total': total, 'bytes': 0, 'start': time.time()}
+        self.last_report = time.time()
+
+    def step(self, nbytes: int = 0):
+        project = self.project
+        project['students'] += 1
+        project['bytes'] += nbytes
+        now = time.time()
+        if self.verbose == 1 and (now - self.last_report >= PROGRESS_INTERVAL or project['students'] == project['total']):
+            self.last_report = now
+            line = f">> {self.status()}"
+            print(line.ljust(self.line_width), end='\r', flush=True)
+            self.line_width = len(line)
+        elif self.verbose == 2 and now - self.last_report >= PROGRESS_JSON_INTERVAL:
+            self.last_report = now
+            self.emit('progress', self.record(), eta=round(self.eta(), 1))
+
+    def end_project(self):
+        project = self.project
+        project['seconds'] = time.time() - project['start']
+        self.projects.append(project)
+        if self.verbose == 1:
+            line = f">> {project['students']}/{project['total']}: {project['project']} in {project['seconds']:.2f}s"
+            if project['bytes']:
+                line += f" ({project['bytes'] / MEGABYTE:.2f} MB)"
+            print(line.ljust(self.line_width))
+            self.line_width = 0
+        elif self.verbose == 2:
+            self.emit('project', self.record())
+        else:
+            print(f">> {project['project']}")
+
+    def finish(self):
+        """
+        Prints the per-project summary (students, bytes, seconds) of the operation.
+        """
+        if self.projects == [] or self.verbose == 0:
+            return
+        students = sum(project['students'] for project in self.projects)
+        nbytes = sum(project['bytes'] for project in self.projects)
+        seconds = sum(project['seconds'] for project in self.projects)
+        if self.verbose == 2:
+            self.emit('summary', {'projects': len(self.projects), 'students': students,
+                                  'bytes': nbytes, 'seconds': round(seconds, 3)})
+            return
+        print(f"[Summary {self.operation}]")
+        print(f"   {'project':<12} {'students':>9} {'MB':>10} {'seconds':>9} {'students/s':>11}")
+        for project in self.projects + [{'project': 'total', 'students': students, 'bytes': nbytes, 'seconds': seconds}]:
+            rate = project['students'] / max(project['seconds'], 1e-6)
+            print(f"   {project['project']:<12} {project['students']:>9} {project['bytes'] / MEGABYTE:>10.2f} "
+                  f"{project['seconds']:>9.2f} {rate:>11.1f}")
+
+    def eta(self):
+        project = self.project
+        elapsed = max(time.time() - project['start'], 1e-6)
+        return (project['total'] - project['students']) * elapsed / max(project['students'], 1)
+
+    def status(self):
+        project = self.project
+        elapsed = max(time.time() - project['start'], 1e-6)
+        status = f"{project['students']}/{project['total']}: {project['project']} | {project['students'] / elapsed:.1f} students/s"
+        if project['bytes']:
+            status += f", {project['bytes'] / MEGABYTE / elapsed:.2f} MB/s"
+        return status + f" | {elapsed:.0f}s elapsed, ETA {self.eta():.0f}s"
+
+    def record(self):
+        project = self.project
+        return {'project': project['project'], 'students': project['students'], 'total': project['total'],
+                'bytes': project['bytes'], 'seconds': round(time.time() - project['start'], 3)}
+
+    def emit(self, event: str, record: dict, **fields):
+        print(json.dumps({'event': event, 'operation': self.operation, **record, **fields}), flush=True)
+
+
+def archive_writer(queue: ByteQueue, errors: list, verbose: bool):
+    """
+    Consumer stage of the download pipeline: appends queued archive chunks to their files.
+
+    Parameters:
+    - queue (ByteQueue): Queue of (path, chunk, is_last, start_time) items; a None item ends the stage.
+    - errors (list): Receives the first exception raised while writing.
+    - verbose (bool): If True, prints the size and throughput of every archive once it is complete.
+
+    Chunks of one archive arrive in order and are never interleaved with another archive.
+    After an error the remaining items are still drained (but not written) so the
+    producer never blocks on a full queue.
+    """
+    outfile = None
+    archive_size = 0
+    while True:
+        item = queue.get()
+        if item is None:
+            break
+        if errors:
+            continue
+        path, chunk, is_last, start_time = item
+        try:
+            if outfile is None:
+                outfile = open(path, "wb")
+                archive_size = 0
+            outfile.write(chunk)
+            archive_size += len(chunk)
+            if is_last:
+                outfile.close()
+                outfile = None
+                if verbose:
+                    seconds = max(time.time() - start_time, 1e-6)
+                    megabytes = archive_size / (1024 * 1024)
+                    print(f"   |> {os.path.basename(path)}: {megabytes:.2f} MB in {seconds:.2f}s ({megabytes / seconds:.2f} MB/s)")
+        except OSError as error:
+            errors.append(error)
+    if outfile is not None:
+        outfile.close()
+
+
+def finish_writer(queue: ByteQueue, writer: threading.Thread, errors: list):
+    """
+    Ends the `archive_writer` thread once the queue is drained and raises its first error, if any.
+
+    Producers check `errors` before each archive and stop at the first one, so a full disk
+    does not keep streaming every remaining archive from the database.
+    """
+    queue.put(None, 0)
+    writer.join()
+    if errors:
+        raise errors[0]
+
+
+def archive_length_query(archive_pk: int):
+    """
+    Returns the query of the size of a submission archive, the first query of `stream_archive`.
+    """
+    return f"""select length(archive) from submission_archives where archive_pk='{archive_pk}';"""
+
+
+def stream_archive(cursor: Cursor, archive_pk: int, path: str, queue: ByteQueue):
+    """
+    Producer stage of the download pipeline: reads one submission archive in
+    ARCHIVE_CHUNK_SIZE pieces and queues them for `archive_writer`.
+
+    Parameters:
+    - cursor (Cursor): The database cursor.
+    - archive_pk (int): Primary key of the archive in submission_archives.
+    - path (str): File path the archive will be written to.
+    - queue (ByteQueue): Queue shared with the writer thread.
+
+    Returns:
+    - int: The number of bytes queued.
+
+    The archive is fetched with ranged SUBSTRING reads, so neither the full BLOB
+    nor a copy of it is ever held in memory. An archive missing from the table is skipped.
+    """
+    length = sql_execute(cursor, archive_length_query(archive_pk))
+    if length == []:
+        return 0
+    length = length or 0
+    start_time = time.time()
+    offset = 0
+    while True:
+        chunk = b''
+        if offset < length:
+            chunk_query = f"""select substring(archive, {offset + 1}, {ARCHIVE_CHUNK_SIZE}) from submission_archives where archive_pk='{archive_pk}';"""
+            chunk = sql_execute(cursor, chunk_query) or b''
+        offset += len(chunk)
+        is_last = offset >= length or chunk == b''
+        queue.put((path, chunk, is_last, start_time), len(chunk))
+        if is_last:
+            return offset
+
+
+def submissions_page_query(proj_pk: int, columns: str, student_pks: list = None, last: dict = None,
+                           order: tuple = ('student_registration_pk', 'submission_pk')):
+    """
+    Returns the query of one page of `page_submissions`; `last` is the last row of the previous page.
+    """
+    page_query = f"""select student_registration_pk, submission_pk, {columns} from submissions where project_pk='{proj_pk}'"""
+    if student_pks is not None:
+        page_query += f""" and student_registration_pk in ({','.join(str(pk) for pk in student_pks)})"""
+    if last is not None:
+        values = [f"'{last[key]}'" if isinstance(last[key], datetime) else str(last[key]) for key in order]
+        after = [' and '.join([f"{key} = {value}" for key, value in zip(order[:i], values[:i])] + [f"{order[i]} > {values[i]}"])
+                 for i in range(len(order))]
+        page_query += f""" and ({' or '.join(f'({condition})' for condition in after)})"""
+    return page_query + f""" order by {', '.join(order)} limit {SUBMISSIONS_PAGE_SIZE}"""
+
+
+def page_submissions(cursor: Cursor, proj_pk: int, columns: str, student_pks: list = None,
+                     order: tuple = ('student_registration_pk', 'submission_pk')):
+    """
+    Reads the submissions of one project page by page.
+
+    Parameters:
+    - cursor (Cursor): The database cursor.
+    - proj_pk (int): Primary key of the project.
+    - columns (str): Columns to select besides student_registration_pk and submission_pk.
+    - student_pks (list): If given, only the submissions of these students are read.
+    - order (tuple): The columns the pages are ordered and keyed by; they must be selected
+      and end with submission_pk so that the key is unique.
+
+    Returns:
+    - generator: Pages of at most SUBMISSIONS_PAGE_SIZE rows, in `order`.
+
+    Each page starts right after the last row of the previous one (keyset pagination), so
+    every query is short and only one page is held in memory, however many resubmissions
+    the project has.
+
+    Example:
+    for page in page_submissions(cursor, 1234, "submission_timestamp, num_passed_overall"):
+        fold_best_submissions(best, page, assn_num, student_deadlines)
+    """
+    if student_pks == []:
+        return
+    last = None
+    while True:
+        page = sql_execute(cursor, submissions_page_query(proj_pk, columns, student_pks, last, order))
+        if page == []:
+            return
+        yield page
+        if len(page) < SUBMISSIONS_PAGE_SIZE:
+            return
+        last = page[-1]
+
+
+def fold_best_submissions(best: dict, submissions, assn_num: int, student_deadlines: dict):
+    """
+    Folds submission rows into the running best submission of each student.
+
+    Parameters:
+    - best (dict): Maps student_registration_pk to the best submission so far; updated in place.
+    - submissions (iterable): Rows with 'student_registration_pk', 'submission_timestamp' and
+      'num_passed_overall', e.g. one page of `page_submissions`.
+    - assn_num (int): The assignment number; every A0 submission counts.
+    - student_deadlines (dict): Maps the student_registration_pk of every student to mark to
+      their deadline, grace period and extension included. Other students are ignored.
+
+    The best submission is the on-time one that passed the most tests; on a tie the first
+    one read is kept.
+    """
+    for item in submissions:
+        student_registration_pk = item['student_registration_pk']
+        if student_registration_pk not in student_deadlines:
+            continue
+        if assn_num != 0 and item['submission_timestamp'] > student_deadlines[student_registration_pk]:
+            continue
+        if student_registration_pk not in best or item['num_passed_overall'] > best[student_registration_pk]['num_passed_overall']:
+            best[student_registration_pk] = item
+
+
+def extract_archive(archive_path: str, target: str, patterns: list):
+    """
+    Worker of `extract`: unpacks one submission archive into its own folder.
+
+    Parameters:
+    - archive_path (str): The {uw_id}.zip file written by `download`.
+    - target (str): The folder to unpack it into; it is replaced.
+    - patterns (list): Shell patterns (e.g. '*.c'); only files whose name or path matches one are kept.
+
+    Returns:
+    - tuple: (archive_path, status, number of files), where status is 'extracted' or an error message.
+    """
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.makedirs(target)
+    files_num = 0
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            for member in archive.infolist():
+                if member.is_dir():
+                    continue
+                if any(fnmatch(member.filename, pattern) or fnmatch(os.path.basename(member.filename), pattern)
+                       for pattern in patterns):
+                    archive.extract(member, target)
+                    files_num += 1
+    except (zipfile.BadZipFile, OSError) as error:
+        shutil.rmtree(target, ignore_errors=True)
+        return archive_path, f"{type(error).__name__}: {error}", files_num
+    return archive_path, 'extracted', files_num
+
+
+def archive_stamp(archive_path: str, patterns: list):
+    """
+    Returns the manifest entry of an archive: its size, modification time and the patterns.
+    """
+    info = os.stat(archive_path)
+    return f"{info.st_size},{info.st_mtime_ns},{','.join(patterns)}"
+
+
+def read_manifest(dest: str, project_name: str):
+    """
+    Reads the extraction manifest of a project, mapping each userid to the stamp
+    (see `archive_stamp`) of the archive its folder was extracted from.
+    """
+    manifest_path = os.path.join(dest, EXTRACT_MANIFESTS, f"{project_name}.json")
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, mode='r') as infile:
+        return json.load(infile)
+
+
+def write_manifest(dest: str, project_name: str, manifest: dict):
+    """
+    Writes the extraction manifest of a project atomically.
+    """
+    manifest_dir = os.path.join(dest, EXTRACT_MANIFESTS)
+    os.makedirs(manifest_dir, exist_ok=True)
+    manifest_path = os.path.join(manifest_dir, f"{project_name}.json")
+    with open(f"{manifest_path}.tmp", mode='w') as outfile:
+        json.dump(manifest, outfile, indent=1, sort_keys=True)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
 
 # ====================================================================
 # Functions
 # ====================================================================
 
-def marks(assn: str, file: str, dest: str, verbose: bool):
+def marks(assn: str, file: str, dest: str, verbose: bool, snapshot_path: str = '',
+          grace_period: float = GRACE_PERIOD, extensions_path: str = '', incremental: bool = False,
+          csv_export: bool = False):
     """
-    Processes student submissions for a given assignment and writes their grades into a CSV file.
+    Processes student submissions for a given assignment and writes their grades into the results store.
 
     Parameters:
     - assn (str): The assignment identifier (e.g., "a1" for Assignment 1).
     - file (str): Path to the file containing the list of student IDs.
-    - dest (str): Destination directory path where the output CSV file will be saved.
+    - dest (str): Destination directory path of the results store (see `results_store`).
     - verbose (bool): If True, the function prints detailed progress information.
+    - snapshot_path (str): If given, the submissions are read from this local snapshot
+      (see `update_snapshot`) and the database is not contacted.
+    - grace_period (float): Grace period in minutes added to every deadline.
+    - extensions_path (str): If given, a file of per-student extensions (see `load_extensions`).
+    - incremental (bool): If True, marks already stored for the project are kept and only
+      students missing from them are queried; students no longer in the list are dropped.
+      Only projects whose latest extended deadline has passed are reused; A0 projects and
+      projects still open are always recomputed.
+    - csv_export (bool): If True, each project is also written to project-[proj]-grades.csv.
 
     This function performs the following steps:
     1. Initializes database connection and retrieves projects and student registration information.
     2. For each project related to the assignment, it fetches submission data from the database.
-    3. Calculates the highest mark for each student and writes these to a CSV file named after the project.
+    3. Calculates the highest mark for each student and replaces the project's marks in the
+       results store of `dest` (dest/marks.sqlite), keyed by (project, student).
     
     Note:
-    - The function assumes the presence of a grace period (GRACE_PERIOD) for submissions.
+    - The function assumes the presence of a grace period (GRACE_PERIOD by default) for submissions.
+    - Combined with a snapshot, different deadline rules can be tried without any database query.
     - It handles different project types by analyzing the project name prefix.
-    - The verbose option enables real-time progress tracking on the console.
+    - The verbose option enables real-time progress tracking on the console: students/s,
+      elapsed time and ETA per project, then a per-project summary (see `Progress`).
+      Verbose level 2 prints the same as JSON lines for cron logs.
+    - Incremental mode is meant for classlist changes after a deadline: kept marks are not
+      rechecked, so run without it to pick up retests or changed extensions.
+    - Submissions are read in pages (see `page_submissions`) and folded into each student's
+      best submission, so only one page is held in memory.
     """
     verbose = int(verbose)
     student_list = get_student_list(file)
-    db, cursor, projects, student_reg_pk = db_init(assn)
+    extensions = load_extensions(extensions_path) if extensions_path else {}
+    if snapshot_path:
+        db, cursor = None, None
+        projects, student_reg_pk, snapshot_submissions, _ = snapshot_init(assn, snapshot_path)
+    else:
+        db, cursor, projects, student_reg_pk = db_init(assn)
+        snapshot_submissions = {}
+    write_marks(cursor, projects, student_reg_pk, snapshot_submissions, student_list, dest, verbose,
+                grace_period, extensions, incremental, csv_export)
+    if db is not None:
+        db.close()
+
+
+def marks_final(project_name: str, deadline: datetime, student_extensions: dict):
+    """
+    Returns True if the marks of a project can no longer change, i.e. its latest extended
+    deadline has passed; marks of A0, which has no deadline, can always change.
+    """
+    latest_deadline = deadline + max(student_extensions.values(), default=timedelta(0))
+    return parse_project(project_name).assignment != 0 and latest_deadline < datetime.today()
+
+
+def write_marks(cursor: Cursor, projects: list, student_reg_pk: list, snapshot_submissions: dict, student_list: list,
+                dest: str, verbose: bool, grace_period: float, extensions: dict, incremental: bool, csv_export: bool):
+    """
+    Writes the best on-time mark of every student of every project into the results store
+    of `dest` (see `marks`).
+
+    Parameters:
+    - cursor (Cursor): The database cursor, or None to use `snapshot_submissions`.
+    - projects (list): The projects to process.
+    - student_reg_pk (list): The student registration information of the course.
+    - snapshot_submissions (dict): Submissions of each project (project_pk -> rows) when `cursor` is None.
+    - student_list (list): The students to write marks for.
+    - dest (str): Destination directory of the results store.
+    - verbose (bool): If True, prints detailed progress information.
+    - grace_period (float): Grace period in minutes added to every deadline.
+    - extensions (dict): The extensions returned by `load_extensions`.
+    - incremental (bool): If True, only students missing from the stored project marks are queried,
+      for projects past their latest extended deadline other than A0 (see `marks`).
+    - csv_export (bool): If True, also writes one project-[proj]-grades.csv file per project.
+    """
     student_reg_pk_dict = {item['cvs_account']: item['student_registration_pk'] for item in student_reg_pk}
 
     assn_num = -1
 
     if not os.path.exists(dest):
         os.makedirs(dest)
+    store = results_store.open_store(dest)
+    progress = Progress("marks", verbose)
 
     for project in projects:
         proj_pk = project['project_pk']
         project_name = project['project_number']
         ontime_date = project['ontime']
-        deadline = ontime_date + timedelta(minutes=GRACE_PERIOD)
-        project_type = (re.split(r'\d+', project_name)[0].upper()).lower()
+        deadline = ontime_date + timedelta(minutes=grace_period)
+        student_extensions = project_extensions(extensions, project_name)
+        project_type = parse_project(project_name).type
         if project_type not in VALID_TYPE:
             continue
 
-        current_assn_num = int(project_name[len(project_type)])
+        current_assn_num = parse_project(project_name).assignment
 
         if current_assn_num != assn_num:
             assn_num = current_assn_num
-            print(f"[Downloading {project_type}{assn_num}] to: {dest}")
-
-        submissions_query = f"""select student_registration_pk, submission_timestamp, num_passed_overall from submissions where project_pk='{proj_pk}'"""
-        submissions = sql_execute(cursor, submissions_query)
-        submissions_dict = {}
-        for item in submissions:
-            student_registration_pk = item['student_registration_pk']
-            if student_registration_pk in submissions_dict:
-                submissions_dict[student_registration_pk].append({'submission_timestamp': item['submission_timestamp'],
-                                                                  'num_passed_overall': item['num_passed_overall']})
-            else:
-                submissions_dict[student_registration_pk] = [{'submission_timestamp': item['submission_timestamp'],
-                                                              'num_passed_overall': item['num_passed_overall']}]
-        
-        with open(f"{dest}/project-{project_name}-grades.csv", mode="w") as outfile:
-            writer = csv.writer(outfile)
-            total_students_num = len(student_list)
-            current_students_num = 0
-            for uw_id in student_list:
-                student_registration_pk = student_reg_pk_dict[uw_id]
-
-                if student_registration_pk in submissions_dict:
-                    student_submission = submissions_dict[student_registration_pk]
-                    if assn_num == 0:
-                        highest_mark = max(student_submission, key=lambda x: x['num_passed_overall'])['num_passed_overall']
-                    else:
-                        on_time_submission = list(filter(lambda x: x['submission_timestamp'] <= deadline, student_submission))
-                        if on_time_submission != []:
-                            highest_mark = max(on_time_submission, key=lambda x: x['num_passed_overall'])['num_passed_overall']
-                        else:
-                            highest_mark = 0
-                else:
-                    highest_mark = 0
-                writer.writerow([uw_id, highest_mark])
-
-                if verbose:
-                    current_students_num += 1
-                    print(f">> {current_students_num}/{total_students_num}: {project_name}", end='\r' , flush=True)
-            if verbose:
-                print(f">> {current_students_num}/{total_students_num}: {project_name}")
-            else:
-                print(f">> {project_name}")
-        
-    db.close()
+            status_print(f"[Downloading {project_type}{assn_num}] to: {dest}", verbose)
+
+        progress.start_project(project_name, len(student_list))
+        reuse = incremental and marks_final(project_name, deadline, student_extensions)
+        previous_grades = results_store.read_project(store, project_name) if reuse else {}
+        new_students_pk = [student_reg_pk_dict[uw_id] for uw_id in student_list if uw_id not in previous_grades]
+        student_deadlines = {student_reg_pk_dict[uw_id]: deadline + student_extensions.get(uw_id, timedelta(0))
+                             for uw_id in student_list if uw_id not in previous_grades}
+
+        best = {}
+        if new_students_pk == []:
+            pass
+        elif cursor is None:
+            fold_best_submissions(best, snapshot_submissions[proj_pk], assn_num, student_deadlines)
+        else:
+            for page in page_submissions(cursor, proj_pk, "submission_timestamp, num_passed_overall",
+                                         new_students_pk if previous_grades else None):
+                fold_best_submissions(best, page, assn_num, student_deadlines)
 
+        rows = []
+        for uw_id in student_list:
+            student_registration_pk = student_reg_pk_dict[uw_id]
 
-def download(assn: str, file: str, dest: str, verbose: bool):
+            if uw_id in previous_grades:
+                highest_mark = previous_grades[uw_id]
+            elif student_registration_pk in best:
+                highest_mark = best[student_registration_pk]['num_passed_overall']
+            else:
+                highest_mark = 0
+            rows.append((uw_id, highest_mark))
+            progress.step()
+        results_store.replace_project(store, project_name, rows)
+        if csv_export:
+            with open(results_store.csv_path(dest, project_name), mode="w") as outfile:
+                csv.writer(outfile).writerows(rows)
+
+        progress.end_project()
+        if verbose == 1 and reuse:
+            print(f"   |> {len(new_students_pk)} new, {len(student_list) - len(new_students_pk)} kept")
+    progress.finish()
+
+
+def download(assn: str, file: str, dest: str, verbose: bool,
+             grace_period: float = GRACE_PERIOD, extensions_path: str = ''):
     """
     Downloads the best submission archives for a given assignment for all students listed in the specified file.
 
@@ -315,6 +1000,8 @@ def download(assn: str, file: str, dest: str, verbose: bool):
     - file (str): The file path that contains a list of student IDs.
     - dest (str): The destination directory where the submission archives will be saved.
     - verbose (bool): If True, prints detailed progress information during execution.
+    - grace_period (float): Grace period in minutes added to every deadline.
+    - extensions_path (str): If given, a file of per-student extensions (see `load_extensions`).
 
     This function:
     1. Sets up a database connection and fetches project and student registration data.
@@ -325,87 +1012,558 @@ def download(assn: str, file: str, dest: str, verbose: bool):
     Note:
     - Assumes the presence of a grace period for submissions.
     - Uses project type and assignment number to organize downloads.
-    - Provides real-time progress updates if verbose is true.
+    - Provides real-time progress updates if verbose is true: students/s, MB/s, elapsed time
+      and ETA per project, then a per-project summary of students, bytes and seconds
+      (see `Progress`). Verbose level 2 prints the same as JSON lines for cron logs.
+    - Submissions are read in pages (see `page_submissions`) and folded into each student's
+      best submission, so only one page is held in memory.
+    - Archives are fetched on this thread in ARCHIVE_CHUNK_SIZE pieces and written by a
+      separate writer thread. At most DOWNLOAD_BUFFER_SIZE bytes are held in memory between them.
+    - In verbose mode the size and throughput of each archive are printed.
     """
     verbose = int(verbose)
     student_list = get_student_list(file)
+    extensions = load_extensions(extensions_path) if extensions_path else {}
     db, cursor, projects, student_reg_pk = db_init(assn)
     student_reg_pk_dict = {item['cvs_account']: item['student_registration_pk'] for item in student_reg_pk}
 
+    write_queue = ByteQueue(DOWNLOAD_BUFFER_SIZE)
+    write_errors = []
+    writer = threading.Thread(target=archive_writer, args=(write_queue, write_errors, verbose == 1), daemon=True)
+    writer.start()
+    progress = Progress("download", verbose)
+
     assn_num = -1
     
     for project in projects:
         proj_pk = project['project_pk']
         project_name = project['project_number']
         ontime_date = project['ontime']
-        deadline = ontime_date + timedelta(minutes=GRACE_PERIOD)
-        project_type = re.split(r'\d+', project_name)[0].upper()
-        current_assn_num = int(project_name[len(project_type)])
+        deadline = ontime_date + timedelta(minutes=grace_period)
+        student_extensions = project_extensions(extensions, project_name)
+        project_type = parse_project(project_name).type.upper()
+        current_assn_num = parse_project(project_name).assignment
 
         if current_assn_num != assn_num:
             assn_num = current_assn_num
-            print(f"[Downloading {project_type}{assn_num}] to: {dest}")
-
-        submissions_query = f"""select student_registration_pk, submission_timestamp, archive_pk, num_passed_overall from submissions where project_pk='{proj_pk}'"""
-        submissions = sql_execute(cursor, submissions_query)
-        submissions_dict = {}
-        for item in submissions:
-            student_registration_pk = item['student_registration_pk']
-            if student_registration_pk in submissions_dict:
-                submissions_dict[student_registration_pk].append({'submission_timestamp': item['submission_timestamp'],
-                                                                  'num_passed_overall': item['num_passed_overall'],
-                                                                  'archive_pk': item['archive_pk']})
-            else:
-                submissions_dict[student_registration_pk] = [{'submission_timestamp': item['submission_timestamp'],
-                                                              'num_passed_overall': item['num_passed_overall'],
-                                                              'archive_pk': item['archive_pk']}]
-        
+            status_print(f"[Downloading {project_type}{assn_num}] to: {dest}", verbose)
+
+        progress.start_project(project_name, len(student_list))
+        student_deadlines = {student_reg_pk_dict[uw_id]: deadline + student_extensions.get(uw_id, timedelta(0))
+                             for uw_id in student_list}
+        best = {}
+        for page in page_submissions(cursor, proj_pk, "submission_timestamp, archive_pk, num_passed_overall"):
+            fold_best_submissions(best, page, assn_num, student_deadlines)
+
         assignment_folder = f"{dest}/a{assn_num}/{project_name}"
         
         if not os.path.exists(assignment_folder):
             os.makedirs(assignment_folder)
 
-        total_students_num = len(student_list)
-        current_students_num = 0
         for uw_id in student_list:
+            if write_errors:
+                break
             student_registration_pk = student_reg_pk_dict[uw_id]
+            best_archive_pk = best[student_registration_pk]['archive_pk'] if student_registration_pk in best else 0
 
-            if student_registration_pk in submissions_dict:
-                student_submission = submissions_dict[student_registration_pk]
-                if assn_num == 0:
-                    best_archive_pk = max(student_submission, key=lambda x: x['num_passed_overall'])['archive_pk']
-                else:
-                    on_time_submission = list(filter(lambda x: x['submission_timestamp'] <= deadline, student_submission))
-                    if on_time_submission != []:
-                        best_archive_pk = max(on_time_submission, key=lambda x: x['num_passed_overall'])['archive_pk']
-                    else:
-                        best_archive_pk = 0
-            else:
-                best_archive_pk = 0
-            
+            archive_bytes = 0
             if best_archive_pk:
-                zip_file_query = f"""select archive from submission_archives where submission_archives.archive_pk='{best_archive_pk}';"""
-                binary_zip = sql_execute(cursor, zip_file_query)
-                with open(f"{assignment_folder}/{uw_id}.zip", "wb") as file:
-                    file.write(binary_zip)
-
-            if verbose:
-                    current_students_num += 1
-                    print(f">> {current_students_num}/{total_students_num}: {project_name}", end='\r' , flush=True)
+                archive_bytes = stream_archive(cursor, best_archive_pk, f"{assignment_folder}/{uw_id}.zip", write_queue)
+            progress.step(archive_bytes)
+        if write_errors:
+            break
+        progress.end_project()
+    
+    db.close()
+    finish_writer(write_queue, writer, write_errors)
+    progress.finish()
+
+
+def extract(source: str, dest: str, patterns: str = '*', verbose: bool = False):
+    """
+    Unpacks downloaded submission archives in parallel into a normalized source tree.
+
+    Parameters:
+    - source (str): A folder written by `download`; every {uw_id}.zip below it is unpacked.
+    - dest (str): Root of the tree; the archive of a project is unpacked into dest/{project}/{uw_id}/.
+    - patterns (str): Comma-separated shell patterns of the files to keep (e.g. '*.c,*.h'), '*' for all.
+    - verbose (bool): If True, prints the result of every archive.
+
+    Note:
+    - Archives are unpacked by one worker process per core.
+    - Folders already extracted from the same archive with the same patterns are skipped,
+      so rerunning after another `download` only unpacks the new or changed archives.
+      What each folder was extracted from is kept in one manifest per project in
+      dest/EXTRACT_MANIFESTS, so nothing but submission files ends up in dest/{project}/.
+    - Archives that cannot be read (e.g. empty submissions) are reported and left out.
+
+    Example:
+    extract("~/marks/current_term/source_file/a5", "~/marks/current_term/extracted", "*.c,*.h")
+    """
+    verbose = int(verbose)
+    pattern_list = [pattern.strip() for pattern in patterns.split(',') if pattern.strip()] or ['*']
+    archives = []
+    targets = []
+    archive_keys = {}
+    manifests = {}
+    counts = {'extracted': 0, 'skipped': 0, 'failed': 0}
+    for root, _, files in os.walk(source):
+        project_name = os.path.basename(root)
+        for file in sorted(files):
+            if file.endswith('.zip'):
+                if project_name not in manifests:
+                    manifests[project_name] = read_manifest(dest, project_name)
+                archive_path = os.path.join(root, file)
+                uw_id = file[:-len('.zip')]
+                target = os.path.join(dest, project_name, uw_id)
+                stamp = archive_stamp(archive_path, pattern_list)
+                if manifests[project_name].get(uw_id) == stamp and os.path.isdir(target):
+                    counts['skipped'] += 1
+                    continue
+                manifests[project_name].pop(uw_id, None)
+                archives.append(archive_path)
+                targets.append(target)
+                archive_keys[archive_path] = (project_name, uw_id, stamp)
+    if archives == [] and counts['skipped'] == 0:
+        print(f"No archives found in {source}")
+        return
+
+    print(f"[Extracting {len(archives)} archives] to: {dest}")
+    with ProcessPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+        results = executor.map(extract_archive, archives, targets, [pattern_list] * len(archives),
+                               chunksize=max(1, len(archives) // (8 * (os.cpu_count() or 1))))
+        for archive_path, status, files_num in results:
+            if status == 'extracted':
+                counts['extracted'] += 1
+                project_name, uw_id, stamp = archive_keys[archive_path]
+                manifests[project_name][uw_id] = stamp
+            else:
+                counts['failed'] += 1
+            if verbose or status != 'extracted':
+                print(f"   |> {os.path.relpath(archive_path, source)}: {status} ({files_num} files)")
+    for project_name, manifest in manifests.items():
+        write_manifest(dest, project_name, manifest)
+    print(f">> {counts['extracted']} extracted, {counts['skipped']} up to date, {counts['failed']} failed")
+
+
+def tests_query(proj_pk: int):
+    """
+    Returns the query of the tests (build tests excluded) of the active test setup of a project.
+    """
+    return f"""select o.test_type, o.test_name, o.test_number, o.point_value
+               from project_jarfiles j join test_outcomes o on o.test_run_pk = j.test_run_pk
+               where j.project_pk = '{proj_pk}' and j.jarfile_status = 'active' and o.test_type <> 'build'
+               order by o.test_type, o.test_number"""
+
+
+def outcomes_query(submission_pks: list):
+    """
+    Returns the query of the test outcomes (build tests excluded) of the given submissions.
+    """
+    return f"""select s.submission_pk, o.test_type, o.test_name, o.point_value, o.outcome
+               from submissions s join test_outcomes o on o.test_run_pk = s.current_test_run_pk
+               where s.submission_pk in ({','.join(str(pk) for pk in submission_pks)})
+               and o.test_type <> 'build'"""
+
+
+def outcomes(assn: str, file: str, dest: str, verbose: bool,
+             grace_period: float = GRACE_PERIOD, extensions_path: str = ''):
+    """
+    Exports the per-test outcomes of every student's best on-time submission.
+
+    Parameters:
+    - assn (str): The assignment identifier.
+    - file (str): Path to the file containing the list of student IDs.
+    - dest (str): Destination directory; one project-[proj]-tests.csv is written per project.
+    - verbose (bool): If True, prints progress information.
+    - grace_period (float): Grace period in minutes added to every deadline.
+    - extensions_path (str): If given, a file of per-student extensions (see `load_extensions`).
+
+    Each CSV has a header 'student,<test_type>:<test_name>,...,total' with the tests of the
+    active test setup (build tests excluded), a '#outof' row with their point values, and
+    one row per student with the points earned on each test. Students without an on-time
+    submission get an empty row.
+
+    Note:
+    - The best submission is chosen as in `marks` (see `fold_best_submissions`).
+    - Outcomes are fetched with one joined query per OUTCOMES_BATCH_SIZE students and
+      written as they arrive, instead of one query per student.
+    """
+    verbose = int(verbose)
+    student_list = get_student_list(file)
+    extensions = load_extensions(extensions_path) if extensions_path else {}
+    db, cursor, projects, student_reg_pk = db_init(assn)
+    student_reg_pk_dict = {item['cvs_account']: item['student_registration_pk'] for item in student_reg_pk}
+
+    if not os.path.exists(dest):
+        os.makedirs(dest)
+
+    for project in projects:
+        proj_pk = project['project_pk']
+        project_name = project['project_number']
+        deadline = project['ontime'] + timedelta(minutes=grace_period)
+        student_extensions = project_extensions(extensions, project_name)
+        assn_num = parse_project(project_name).assignment
+
+        tests = sql_execute(cursor, tests_query(proj_pk))
+        test_columns = [f"{test['test_type']}:{test['test_name']}" for test in tests]
+        column_index = {name: i for i, name in enumerate(test_columns)}
+
+        student_deadlines = {student_reg_pk_dict[uw_id]: deadline + student_extensions.get(uw_id, timedelta(0))
+                             for uw_id in student_list}
+        best = {}
+        for page in page_submissions(cursor, proj_pk, "submission_timestamp, num_passed_overall"):
+            fold_best_submissions(best, page, assn_num, student_deadlines)
+
+        best_submissions = {}
+        for uw_id in student_list:
+            if student_reg_pk_dict[uw_id] in best:
+                best_submissions[uw_id] = best[student_reg_pk_dict[uw_id]]['submission_pk']
+        submission_students = {pk: uw_id for uw_id, pk in best_submissions.items()}
+
+        with open(f"{dest}/project-{project_name}-tests.csv", mode="w") as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(['student'] + test_columns + ['total'])
+            writer.writerow(['#outof'] + [test['point_value'] for test in tests] + [sum(test['point_value'] for test in tests)])
+            for start in range(0, len(student_list), OUTCOMES_BATCH_SIZE):
+                batch = student_list[start:start + OUTCOMES_BATCH_SIZE]
+                batch_pks = [best_submissions[uw_id] for uw_id in batch if uw_id in best_submissions]
+                points = {}
+                if batch_pks:
+                    for item in sql_execute(cursor, outcomes_query(batch_pks)):
+                        uw_id = submission_students[item['submission_pk']]
+                        column = column_index.get(f"{item['test_type']}:{item['test_name']}")
+                        if column is not None:
+                            earned = item['point_value'] if item['outcome'] == 'passed' else 0
+                            points.setdefault(uw_id, [0] * len(test_columns))[column] = earned
+                for uw_id in batch:
+                    if uw_id in points:
+                        writer.writerow([uw_id] + points[uw_id] + [sum(points[uw_id])])
+                    elif uw_id in best_submissions:
+                        writer.writerow([uw_id] + [0] * len(test_columns) + [0])
+                    else:
+                        writer.writerow([uw_id] + [''] * (len(test_columns) + 1))
         if verbose:
-            print(f">> {current_students_num}/{total_students_num}: {project_name}")
+            print(f">> {project_name}: {len(test_columns)} tests, {len(best_submissions)}/{len(student_list)} submissions")
         else:
             print(f">> {project_name}")
-    
-    db.close()     
+
+    db.close()
+
+
+HISTORY_ORDER = ('student_registration_pk', 'submission_timestamp', 'submission_pk')
+
+
+def history_records(submissions, student_names: dict, deadline: datetime, student_extensions: dict):
+    """
+    Turns a stream of submission rows into history records.
+
+    Parameters:
+    - submissions (iterable): Submission rows in HISTORY_ORDER.
+    - student_names (dict): Maps student_registration_pk to the student's userid.
+    - deadline (datetime): The project deadline, grace period included.
+    - student_extensions (dict): The extensions returned by `project_extensions`.
+
+    Returns:
+    - generator: One dict per submission with 'student', 'submission_pk', 'timestamp',
+      'passed', 'ontime' (1 if submitted by the student's deadline, else 0) and 'archive_pk'.
+    """
+    for item in submissions:
+        uw_id = student_names[item['student_registration_pk']]
+        student_deadline = deadline + student_extensions.get(uw_id, timedelta(0))
+        yield {'student': uw_id,
+               'submission_pk': item['submission_pk'],
+               'timestamp': item['submission_timestamp'],
+               'passed': item['num_passed_overall'],
+               'ontime': int(item['submission_timestamp'] <= student_deadline),
+               'archive_pk': item['archive_pk']}
+
+
+def history(assn: str, file: str, dest: str, verbose: bool,
+            grace_period: float = GRACE_PERIOD, extensions_path: str = '', archives: bool = False):
+    """
+    Exports the full submission history of the listed students, not only their best submission.
+
+    Parameters:
+    - assn (str): The assignment identifier.
+    - file (str): Path to the file containing the list of student IDs.
+    - dest (str): Destination directory; one project-[proj]-history.csv is written per project.
+    - verbose (bool): If True, prints progress information.
+    - grace_period (float): Grace period in minutes added to every deadline.
+    - extensions_path (str): If given, a file of per-student extensions (see `load_extensions`).
+    - archives (bool): If True, every archive is also saved as dest/[proj]/[userid]/[submission_pk].zip.
+
+    Each CSV has a header 'student,submission_pk,timestamp,passed,ontime,archive_pk' and one
+    row per submission, ordered by student and time. 'ontime' is 1 for submissions made by
+    ontime + grace period (plus the student's extension), else 0.
+
+    Note:
+    - Rows are read in keyset pages (see `page_submissions`) and written page by page, so
+      memory stays flat however many resubmissions there are and no read is held open.
+    - Each page is fully fetched before its archives are read, so they share the one
+      connection; they are written by the same writer thread as `download`.
+
+    Example:
+    history("a5", "suspects.txt", "~/marks/current_term/history", 1)
+    """
+    verbose = int(verbose)
+    student_list = get_student_list(file)
+    extensions = load_extensions(extensions_path) if extensions_path else {}
+    db, cursor, projects, student_reg_pk = db_init(assn)
+    student_reg_pk_dict = {item['cvs_account']: item['student_registration_pk'] for item in student_reg_pk}
+    student_pks = [student_reg_pk_dict[uw_id] for uw_id in student_list if uw_id in student_reg_pk_dict]
+    student_names = {pk: uw_id for uw_id, pk in student_reg_pk_dict.items()}
+
+    if archives:
+        write_queue = ByteQueue(DOWNLOAD_BUFFER_SIZE)
+        write_errors = []
+        writer = threading.Thread(target=archive_writer, args=(write_queue, write_errors, verbose == 1), daemon=True)
+        writer.start()
+
+    if not os.path.exists(dest):
+        os.makedirs(dest)
+
+    for project in projects:
+        project_name = project['project_number']
+        deadline = project['ontime'] + timedelta(minutes=grace_period)
+        student_extensions = project_extensions(extensions, project_name)
+        pages = page_submissions(cursor, project['project_pk'], "submission_timestamp, num_passed_overall, archive_pk",
+                                 student_pks, HISTORY_ORDER)
+        records = history_records((item for page in pages for item in page), student_names, deadline, student_extensions)
+
+        submissions_num = 0
+        late_num = 0
+        with open(f"{dest}/project-{project_name}-history.csv", mode="w") as outfile:
+            csv_writer = csv.writer(outfile)
+            csv_writer.writerow(['student', 'submission_pk', 'timestamp', 'passed', 'ontime', 'archive_pk'])
+            for record in records:
+                csv_writer.writerow([record['student'], record['submission_pk'], record['timestamp'],
+                                 record['passed'], record['ontime'], record['archive_pk']])
+                submissions_num += 1
+                late_num += 1 - record['ontime']
+                if archives and write_errors:
+                    break
+                if archives and record['archive_pk']:
+                    archive_folder = f"{dest}/{project_name}/{record['student']}"
+                    if not os.path.exists(archive_folder):
+                        os.makedirs(archive_folder)
+                    stream_archive(cursor, record['archive_pk'], f"{archive_folder}/{record['submission_pk']}.zip", write_queue)
+        if archives and write_errors:
+            break
+        if verbose:
+            print(f">> {project_name}: {submissions_num} submissions ({late_num} late)")
+        else:
+            print(f">> {project_name}")
+
+    db.close()
+    if archives:
+        finish_writer(write_queue, writer, write_errors)
 
 
-def outof(assn: str):
+def explain(cursor: Cursor, query: str):
+    """
+    Runs EXPLAIN on a query and prints its plan, one line per table.
+
+    Parameters:
+    - cursor (Cursor): The database cursor.
+    - query (str): The query; it is not run.
+
+    Returns:
+    - int: The largest row estimate of the plan, 0 if the server gives none.
+
+    Tables read with a full scan (access type ALL) are flagged with '!!'.
+    """
+    plan_rows = sql_execute(cursor, f"explain {query}")
+    if plan_rows == []:
+        return 0
+    columns = [column for column in PLAN_COLUMNS if column in plan_rows[0]] or list(plan_rows[0].keys())
+    for row in plan_rows:
+        print("      " + ", ".join(f"{column}={row[column]}" for column in columns))
+        if row.get('type') == 'ALL':
+            print(f"      !! full table scan on {row.get('table')}")
+    return max(int(row.get('rows') or 0) for row in plan_rows)
+
+
+def plan_step(cursor: Cursor, label: str, query: str, verbose: int):
+    """
+    Prints the EXPLAIN of one query of `plan` under its label; returns its largest row estimate.
+    """
+    print(f"   [{label}]")
+    if verbose:
+        print(f"      {' '.join(query.split())}")
+    return explain(cursor, query)
+
+
+def sample_query(proj_pk: int, student_pks: list = None):
+    """
+    Returns the query of a few real submissions of a project, used by `plan` as sample keys.
+    """
+    query = f"""select student_registration_pk, submission_pk, submission_timestamp, archive_pk
+                from submissions where project_pk='{proj_pk}'"""
+    if student_pks is not None:
+        query += f""" and student_registration_pk in ({','.join(str(pk) for pk in student_pks)})"""
+    return query + f""" limit {OUTCOMES_BATCH_SIZE}"""
+
+
+def plan_snapshot(operation: str, assn: str, file: str, snapshot_path: str,
+                  grace_period: float, extensions: dict, incremental: bool, dest: str):
+    """
+    `plan` of marks read from a local snapshot: no database query is sent, so only the
+    matching projects and what the snapshot holds for them are shown.
+    """
+    if operation != 'marks':
+        print("Only marks can be read from the snapshot")
+        exit(1)
+    student_list = get_student_list(file)
+    projects, _, submissions, _ = snapshot_init(assn, snapshot_path, check_untested=False)
+    untested = {}
+    for submission_pk, project_pk in snapshot.read_snapshot(snapshot_path)[0]['untested']:
+        untested[project_pk] = untested.get(project_pk, 0) + 1
+    stored = results_store.load_results(dest) if incremental else {}
+    print(f"[Plan {operation} {assn}] snapshot {snapshot_path}, no database query")
+    for project in projects:
+        proj_pk = project['project_pk']
+        project_name = project['project_number']
+        print(f">> {project_name} (project_pk {proj_pk}, ontime {project['ontime']})")
+        deadline = project['ontime'] + timedelta(minutes=grace_period)
+        if incremental and marks_final(project_name, deadline, project_extensions(extensions, project_name)):
+            kept = {uw_id for uw_id, _ in stored.get(project_name, [])}
+            print(f"      => {len([uw_id for uw_id in student_list if uw_id in kept])}/{len(student_list)} students kept")
+        print(f"      => {len(submissions.get(proj_pk, []))} submissions in the snapshot")
+        if proj_pk in untested and project['ontime'] < datetime.today():
+            print(f"      !! {untested[proj_pk]} submissions not tested yet; marks would refuse the snapshot")
+    print(f"[Total] {len(projects)} projects, 0 queries (nothing downloaded)")
+
+
+def plan(operation: str, assn: str, file: str, verbose: bool = False, snapshot_path: str = '',
+         grace_period: float = GRACE_PERIOD, extensions_path: str = '', incremental: bool = False, dest: str = ''):
+    """
+    Dry run: shows the projects an assignment identifier matches and the queries an
+    operation would send for them, with their EXPLAIN output and row estimates.
+
+    Parameters:
+    - operation (str): 'marks', 'download', 'outcomes' or 'history'.
+    - assn (str): The assignment identifier, resolved as in `db_init`.
+    - file (str): Path to the file containing the list of student IDs.
+    - verbose (bool): If True, the text of every query is printed as well.
+    - snapshot_path (str): If given, marks would be read from this snapshot (see `plan_snapshot`).
+    - grace_period (float): Grace period in minutes, used with `incremental`.
+    - extensions_path (str): If given, a file of per-student extensions, used with `incremental`.
+    - incremental (bool): If True, marks are planned as `marks` -n would run them: projects
+      whose marks are final only query the students missing from the results store of `dest`.
+    - dest (str): Destination directory of the marks, used with `incremental`.
+
+    Only the course, projects, students and a sample of up to OUTCOMES_BATCH_SIZE submissions
+    per project are read; every other query is only EXPLAINed, so nothing is downloaded or
+    written. The sample gives real keys to the queries that need them: the last row of a
+    page for the next page, an archive_pk and a batch of submission_pks.
+
+    Note:
+    - The number of submission page queries is estimated from the EXPLAIN row estimate
+      and SUBMISSIONS_PAGE_SIZE; archives take at least two queries each (size and content).
+    - A '!!' line marks a full table scan, e.g. a missing index or an unexpectedly broad regex.
+
+    Example:
+    plan("marks", "a7", "path/to/classlist.csv")
+    """
+    verbose = int(verbose)
+    extensions = load_extensions(extensions_path) if extensions_path else {}
+    if snapshot_path:
+        plan_snapshot(operation, assn, file, snapshot_path, grace_period, extensions, incremental, dest)
+        return
+    student_list = get_student_list(file)
+    db, cursor = db_connect()
+
+    course_pk = sql_execute(cursor, course_query())
+    if course_pk == []:
+        print(f"No course {COURSENAME} in {CURRTERM}")
+        db.close()
+        exit(1)
+    print(f"[Plan {operation} {assn}] {COURSENAME} {CURRTERM} (course_pk {course_pk})")
+
+    total_queries = 3
+    total_rows = plan_step(cursor, "projects", projects_query(assn, course_pk), verbose)
+    total_rows += plan_step(cursor, "students", students_query(course_pk), verbose)
+
+    projects = sql_execute(cursor, projects_query(assn, course_pk))
+    student_reg_pk = sql_execute(cursor, students_query(course_pk))
+    if projects == []:
+        print(f"No project matches {assn}")
+        db.close()
+        exit(0)
+    student_reg_pk_dict = {item['cvs_account']: item['student_registration_pk'] for item in student_reg_pk}
+    student_pks = [student_reg_pk_dict[uw_id] for uw_id in student_list if uw_id in student_reg_pk_dict]
+    stored = results_store.load_results(dest) if incremental else {}
+
+    for project in projects:
+        proj_pk = project['project_pk']
+        project_name = project['project_number']
+        print(f">> {project_name} (project_pk {proj_pk}, ontime {project['ontime']})")
+        order = ('student_registration_pk', 'submission_pk')
+        page_students = None
+        if operation == 'history':
+            columns, page_students, order = "submission_timestamp, num_passed_overall, archive_pk", student_pks, HISTORY_ORDER
+        elif operation == 'download':
+            columns = "submission_timestamp, archive_pk, num_passed_overall"
+        else:
+            columns = "submission_timestamp, num_passed_overall"
+        if operation == 'outcomes':
+            rows = plan_step(cursor, "tests", tests_query(proj_pk), verbose)
+            total_rows += rows
+            total_queries += 1
+            print(f"      => ~{rows} rows, 1 queries")
+        if operation == 'marks' and incremental:
+            deadline = project['ontime'] + timedelta(minutes=grace_period)
+            if marks_final(project_name, deadline, project_extensions(extensions, project_name)):
+                kept = {uw_id for uw_id, _ in stored.get(project_name, [])}
+                if kept:
+                    page_students = [student_reg_pk_dict[uw_id] for uw_id in student_list if uw_id not in kept]
+                    print(f"   [-n] {len(student_list) - len(page_students)}/{len(student_list)} students kept")
+        if page_students == []:
+            print("      => no query, no student to read")
+            continue
+
+        rows = plan_step(cursor, "submissions page", submissions_page_query(proj_pk, columns, page_students, order=order), verbose)
+        pages = rows // SUBMISSIONS_PAGE_SIZE + 1
+        total_rows += rows
+        total_queries += pages
+        print(f"      => ~{rows} rows, {pages} queries")
+
+        sample = sql_execute(cursor, sample_query(proj_pk, page_students))
+        if sample == []:
+            print("      => no submission yet to sample keys from")
+            continue
+        sample = sorted(sample, key=lambda item: tuple(item[key] for key in order))
+        rows = plan_step(cursor, "submissions page, continued",
+                         submissions_page_query(proj_pk, columns, page_students, sample[0], order), verbose)
+        print(f"      => ~{rows} rows per continued page")
+
+        if operation == 'download':
+            archive_pk = next((item['archive_pk'] for item in sample if item['archive_pk']), 0)
+            rows = plan_step(cursor, "archive, per student", archive_length_query(archive_pk), verbose)
+            count = 2 * len(student_list)
+            total_rows += rows * count
+            total_queries += count
+            print(f"      => ~{rows} rows, {count} queries")
+        elif operation == 'outcomes':
+            rows = plan_step(cursor, "outcomes batch", outcomes_query([item['submission_pk'] for item in sample]), verbose)
+            count = -(-len(student_list) // OUTCOMES_BATCH_SIZE)
+            total_rows += rows * count
+            total_queries += count
+            print(f"      => ~{rows} rows, {count} queries")
+
+    print(f"[Total] {len(projects)} projects, ~{total_queries} queries, ~{total_rows} rows examined (nothing downloaded)")
+    db.close()
+
+
+def outof(assn: str, snapshot_path: str = ''):
     """
     Retrieves and prints the total points available for each project associated with a given assignment.
 
     Parameters:
     - assn (str): The assignment identifier.
+    - snapshot_path (str): If given, the full marks are read from this local snapshot
+      (see `update_snapshot`) and the database is not contacted.
 
     This function:
     1. Initializes the database connection and retrieves project information.
@@ -415,37 +1573,285 @@ def outof(assn: str):
     The output format includes a header with the assignment number followed by project names and their respective points.
     
     Note:
-    - Sorts the projects by their names before printing.
+    - Groups the projects by assignment number and sorts them by name within each group.
     - Outputs directly to the console.
     """
-    db, cursor, projects, student_reg_pk = db_init(assn)
+    if snapshot_path:
+        projects, student_reg_pk, _, outofs = snapshot_init(assn, snapshot_path, check_untested=False)
+        result = {project['project_number'].split('-')[0]: outofs[project['project_pk']] for project in projects}
+    else:
+        db, cursor, projects, student_reg_pk = db_init(assn)
+
+        result = {}
+        for project in projects:
+            proj_pk = project['project_pk']
+            project_name = project['project_number'].split('-')[0]
+            result[project_name] = project_outof(cursor, proj_pk)
+        db.close() 
+    print_outof(result)
 
-    result = {}
-    for project in projects:
-        proj_pk = project['project_pk']
-        project_name = project['project_number'].split('-')[0]
 
-        test_run_pk_query = f"""select test_run_pk from project_jarfiles where project_pk = '{proj_pk}' and jarfile_status='active';"""
-        test_run_pk = sql_execute(cursor, test_run_pk_query)
+def print_outof(result: dict):
+    """
+    Prints the full marks of projects grouped by assignment (see `outof`).
 
-        outof_query = f"""select sum(point_value) from test_outcomes where test_type <> 'build' and test_run_pk = '{test_run_pk}';"""
-        outof = sql_execute(cursor, outof_query)
-        result[project_name] = outof
-    db.close() 
-    result = dict(sorted(result.items(), key=lambda item: item[0]))
+    Parameters:
+    - result (dict): Maps each project name to its full marks.
+    """
+    catalog = build_catalog(result)
     
     if result != {}:
         print("project,fullMarks")
-        current_num = -1
-        for project in result:
-            assignment_num = int(project[1])
-            if assignment_num > current_num:
-                current_num = assignment_num
-                print(f"# Assignment {current_num}")
-            print(f"{project},{result[project]}")
+        for assignment_num in sorted(catalog['by_assignment'], key=lambda num: float('inf') if num is None else num):
+            print(f"# Assignment {assignment_num}" if assignment_num is not None else "# Other")
+            for project in sorted(catalog['by_assignment'][assignment_num], key=lambda item: item.name):
+                print(f"{project.name},{result[project.name]}")
     else:
         print("INVALID NUMBER")
 
+
+def courses_init(assn: str, coursenames: list):
+    """
+    Multi-course counterpart of `db_init`: retrieves the projects and student registrations
+    of several courses of the current term over one connection.
+
+    Parameters:
+    - assn (str): The assignment identifier, resolved in every course (see `select_projects`).
+    - coursenames (list): Course names as in Marmoset, e.g. ['CS136', 'CS135'].
+
+    Returns:
+    - tuple: The database connection, cursor and a dictionary mapping each course found
+      to {'projects', 'students'}.
+
+    The courses, projects and student registrations are each fetched with one query
+    for all courses. Courses that do not exist this term are reported and skipped; if
+    none exists, the function exits.
+
+    Example:
+    db, cursor, courses = courses_init("c", ["CS136", "CS135"])
+    """
+    db, cursor = db_connect()
+
+    names = ','.join(f"'{name}'" for name in coursenames)
+    course_query = f"""select course_pk, coursename from courses where semester = '{CURRTERM}' and coursename in ({names})"""
+    course_pks = {item['course_pk']: item['coursename'] for item in sql_execute(cursor, course_query)}
+    for name in coursenames:
+        if name not in course_pks.values():
+            print(f"{name} not found in {CURRTERM}")
+    if course_pks == {}:
+        db.close()
+        exit(1)
+
+    pks = ','.join(str(pk) for pk in course_pks)
+    projects_query = f"""select project_pk, course_pk, project_number, ontime from projects where course_pk in ({pks})"""
+    students_query = f"""select course_pk, cvs_account, student_registration_pk from student_registration where course_pk in ({pks})"""
+    projects = sql_execute(cursor, projects_query)
+    students = sql_execute(cursor, students_query)
+
+    courses = {}
+    for course_pk, name in course_pks.items():
+        courses[name] = {'projects': select_projects(assn, [item for item in projects if item['course_pk'] == course_pk]),
+                         'students': [item for item in students if item['course_pk'] == course_pk]}
+    return db, cursor, courses
+
+
+def course_path(path: str, coursename: str):
+    """
+    Returns the per-course version of a path given to the multi-course functions.
+
+    Parameters:
+    - path (str): A path, where '{course}' stands for the lower-case course name.
+    - coursename (str): The course name.
+
+    Example:
+    course_path("/u/{course}/marks/current_term/classlist.csv", "CS136")
+    """
+    return path.replace('{course}', coursename.lower())
+
+
+def courses_marks(coursenames: list, assn: str, file: str, dest: str, verbose: bool,
+                  grace_period: float = GRACE_PERIOD, extensions_path: str = '', incremental: bool = False,
+                  csv_export: bool = False):
+    """
+    Runs `marks` for several courses in one process and over one database connection.
+
+    Parameters:
+    - coursenames (list): Course names as in Marmoset, e.g. ['CS136', 'CS135'].
+    - assn (str): The assignment identifier, resolved in every course.
+    - file (str): The student list of each course; '{course}' is replaced by the course name.
+    - dest (str): Destination directory; '{course}' is replaced by the course name,
+      otherwise each course is written to a sub-folder named after it.
+    - verbose (bool): If True, prints detailed progress information.
+    - grace_period (float): Grace period in minutes added to every deadline.
+    - extensions_path (str): Per-student extensions of each course ('{course}' is replaced);
+      courses without such a file have no extensions.
+    - incremental (bool): See `marks`.
+    - csv_export (bool): See `marks`.
+
+    Example:
+    courses_marks(["CS136", "CS135"], "c", "/u/{course}/marks/current_term/classlist.csv", "/tmp/marks", 0)
+    """
+    verbose = int(verbose)
+    db, cursor, courses = courses_init(assn, coursenames)
+    for name, course in courses.items():
+        status_print(f"[{name}]", verbose)
+        course_dest = course_path(dest, name) if '{course}' in dest else f"{dest}/{name.lower()}"
+        course_extensions = course_path(extensions_path, name)
+        extensions = load_extensions(course_extensions) if os.path.isfile(course_extensions) else {}
+        write_marks(cursor, course['projects'], course['students'], {}, get_student_list(course_path(file, name)),
+                    course_dest, verbose, grace_period, extensions, incremental, csv_export)
+    db.close()
+
+
+def courses_outof(coursenames: list, assn: str):
+    """
+    Runs `outof` for several courses in one process. The full marks of all matched
+    projects are fetched with a single query.
+
+    Parameters:
+    - coursenames (list): Course names as in Marmoset, e.g. ['CS136', 'CS135'].
+    - assn (str): The assignment identifier, resolved in every course.
+    """
+    db, cursor, courses = courses_init(assn, coursenames)
+    project_pks = ','.join(str(project['project_pk']) for course in courses.values() for project in course['projects'])
+    outofs = {}
+    if project_pks:
+        outof_query = f"""select j.project_pk, sum(o.point_value) as outof
+                          from project_jarfiles j join test_outcomes o on o.test_run_pk = j.test_run_pk
+                          where j.jarfile_status = 'active' and o.test_type <> 'build' and j.project_pk in ({project_pks})
+                          group by j.project_pk"""
+        outofs = {item['project_pk']: item['outof'] for item in sql_execute(cursor, outof_query)}
+    db.close()
+
+    for name, course in courses.items():
+        print(f"[{name}]")
+        print_outof({project['project_number'].split('-')[0]: outofs.get(project['project_pk'], [])
+                     for project in course['projects']})
+
+
+def update_snapshot(snapshot_path: str):
+    """
+    Creates or incrementally refreshes the local snapshot of this term's submissions.
+
+    Parameters:
+    - snapshot_path (str): The snapshot file path.
+
+    This function:
+    1. Reloads the course projects (with their full marks) and student registrations.
+    2. Fetches only the submissions whose submission_pk is greater than the last one
+       already in the snapshot, and appends them to the snapshot columns.
+    3. Re-reads the submissions that were not tested yet (num_passed_overall NULL) when
+       they were captured, and stores their results once they are tested.
+    4. Writes the snapshot back atomically.
+
+    Note:
+    - Tested submissions are never re-read, so a retest that changes num_passed_overall of an
+      old submission is only picked up after deleting the snapshot (full rebuild).
+    - Submissions still untested are listed in the snapshot, and `snapshot_init` refuses
+      marks from the snapshot for projects past their deadline until they are tested.
+    - A snapshot of another term or course is rebuilt from scratch.
+    """
+    meta, columns = snapshot.read_snapshot(snapshot_path)
+    if meta.get('term') != CURRTERM or meta.get('course') != COURSENAME:
+        meta, columns = snapshot.empty_snapshot()
+
+    db, cursor = db_connect()
+    course_pk = sql_execute(cursor, course_query())
+    if course_pk == []:
+        db.close()
+        exit(1)
+
+    projects = sql_execute(cursor, course_projects_query(course_pk))
+    student_reg_pk = sql_execute(cursor, students_query(course_pk))
+
+    submissions_query = f"""select s.submission_pk, s.project_pk, s.student_registration_pk, s.submission_timestamp,
+                                   s.num_passed_overall, s.archive_pk
+                            from submissions s join projects p on s.project_pk = p.project_pk
+                            where p.course_pk = '{course_pk}' and s.submission_pk > '{meta['last_submission_pk']}'
+                            order by s.submission_pk"""
+    submissions = sql_execute(cursor, submissions_query)
+    untested = meta['untested']
+    still_untested = []
+    for start in range(0, len(untested), SUBMISSIONS_PAGE_SIZE):
+        batch = untested[start:start + SUBMISSIONS_PAGE_SIZE]
+        retest_query = f"""select submission_pk, num_passed_overall from submissions
+                           where submission_pk in ({','.join(str(pair[0]) for pair in batch)})"""
+        retested = sql_execute(cursor, retest_query)
+        still_untested += snapshot.update_submissions(columns, batch, list(retested) if retested != [] else [])
+    meta['untested'] = still_untested + snapshot.append_submissions(columns, submissions)
+
+    meta['term'] = CURRTERM
+    meta['course'] = COURSENAME
+    meta['updated'] = datetime.today().isoformat(timespec='seconds')
+    meta['projects'] = []
+    for project in projects:
+        outof = project_outof(cursor, project['project_pk'])
+        # sum() comes back as a Decimal (or NULL); keep it JSON friendly
+        if outof is not None and outof != []:
+            outof = int(outof) if outof == int(outof) else float(outof)
+        meta['projects'].append({'project_pk': project['project_pk'],
+                                 'project_number': project['project_number'],
+                                 'ontime': project['ontime'].isoformat(),
+                                 'outof': outof})
+    meta['students'] = list(student_reg_pk)
+    if len(columns['submission_pk']):
+        meta['last_submission_pk'] = max(meta['last_submission_pk'], columns['submission_pk'][-1])
+    db.close()
+
+    snapshot.write_snapshot(snapshot_path, meta, columns)
+    print(f">> Snapshot updated: {len(submissions)} new submissions, {len(columns['submission_pk'])} in total, "
+          f"{len(meta['untested'])} not tested yet")
+
+
+def schedule(file: str, dest: str, verbose: bool, csv_export: bool = False,
+             grace_period: float = GRACE_PERIOD, extensions_path: str = ''):
+    """
+    Waits for each upcoming project deadline and downloads its marks once the grace period has passed.
+
+    Parameters:
+    - file (str): Path to the file containing the list of student IDs.
+    - dest (str): Destination directory path of the results store.
+    - verbose (bool): If True, the function prints detailed progress information.
+    - csv_export (bool): See `marks`.
+    - grace_period (float): Grace period in minutes added to every deadline.
+    - extensions_path (str): If given, a file of per-student extensions (see `load_extensions`).
+
+    This function:
+    1. Queries the upcoming projects (ontime in the future) once and closes the connection.
+    2. Groups the projects by their deadline (ontime + grace period), and projects with
+       extensions also by their latest extended deadline.
+    3. Sleeps until each deadline and then calls `marks` once for the projects due at that time.
+
+    Note:
+    - The database is not polled while waiting; projects added or moved after the
+      schedule is built are picked up by the next run.
+    - The pass at the latest extended deadline recomputes the whole project, so marks of
+      students submitting within their extension replace the ones of the first pass.
+    """
+    db, cursor, projects, student_reg_pk = db_init('u')
+    db.close()
+    extensions = load_extensions(extensions_path) if extensions_path else {}
+
+    deadlines = {}
+    for project in projects:
+        deadline = project['ontime'] + timedelta(minutes=grace_period)
+        deadlines.setdefault(deadline, []).append(project['project_number'])
+        student_extensions = project_extensions(extensions, project['project_number'])
+        if student_extensions:
+            extended_deadline = deadline + max(student_extensions.values())
+            if extended_deadline > deadline:
+                deadlines.setdefault(extended_deadline, []).append(project['project_number'])
+
+    for deadline in sorted(deadlines):
+        project_names = deadlines[deadline]
+        status_print(f"[Waiting until {deadline}] for: {', '.join(project_names)}", verbose)
+        remaining = (deadline - datetime.today()).total_seconds()
+        while remaining > 0:
+            time.sleep(min(remaining, 3600))
+            remaining = (deadline - datetime.today()).total_seconds()
+        marks(f"^({'|'.join(project_names)})$", file, dest, verbose, grace_period=grace_period,
+              extensions_path=extensions_path, csv_export=csv_export)
+
 # ====================================================================
 # Start of main program
 # ====================================================================
@@ -453,31 +1859,122 @@ def outof(assn: str):
 def main():
     func = sys.argv[1]
     if func == 'marks':
-        if len(sys.argv) == 6:
+        if 6 <= len(sys.argv) <= 11:
             assn = sys.argv[2]
             file = sys.argv[3]
             dest = sys.argv[4]
             verb = sys.argv[5]
-            marks(assn, file, dest, verb)
+            # optional arguments may be passed as '' to keep their default
+            snapshot_path, grace, extensions_path, incremental, csv_export = (sys.argv[6:] + ['', '', '', '', ''])[:5]
+            grace_period = float(grace) if grace else GRACE_PERIOD
+            marks(assn, file, dest, verb, snapshot_path, grace_period, extensions_path,
+                  int(incremental or 0), int(csv_export or 0))
         else:
-            print("Usage: ASSIGNMENT_NUM, CLASSLIST_PATH, DESTINATION")
+            print("Usage: ASSIGNMENT_NUM, CLASSLIST_PATH, DESTINATION, [SNAPSHOT_PATH], [GRACE_PERIOD], [EXTENSIONS_PATH], [INCREMENTAL], [CSV_EXPORT]")
             sys.exit(1)
     elif func == 'download':
-        if len(sys.argv) == 6:
+        if 6 <= len(sys.argv) <= 8:
             assn = sys.argv[2]
             file = sys.argv[3]
             dest = sys.argv[4]
             verb = sys.argv[5]
-            download(assn, file, dest, verb)
+            grace, extensions_path = (sys.argv[6:] + ['', ''])[:2]
+            grace_period = float(grace) if grace else GRACE_PERIOD
+            download(assn, file, dest, verb, grace_period, extensions_path)
         else:
-            print("Usage: ASSIGNMENT_NUM, CLASSLIST_PATH, DESTINATION")
+            print("Usage: ASSIGNMENT_NUM, CLASSLIST_PATH, DESTINATION, [GRACE_PERIOD], [EXTENSIONS_PATH]")
             sys.exit(1)
     elif func == 'outof':
+        if len(sys.argv) in (3, 4):
+            assn = sys.argv[2]
+            snapshot_path = sys.argv[3] if len(sys.argv) == 4 else ''
+            outof(assn, snapshot_path)
+        else:
+            print("Usage: ASSIGNMENT_NUM, [SNAPSHOT_PATH]")
+            sys.exit(1)
+    elif func == 'snapshot':
         if len(sys.argv) == 3:
+            snapshot_path = sys.argv[2]
+            update_snapshot(snapshot_path)
+        else:
+            print("Usage: SNAPSHOT_PATH")
+            sys.exit(1)
+    elif func == 'schedule':
+        if 5 <= len(sys.argv) <= 8:
+            file = sys.argv[2]
+            dest = sys.argv[3]
+            verb = sys.argv[4]
+            csv_export, grace, extensions_path = (sys.argv[5:] + ['', '', ''])[:3]
+            grace_period = float(grace) if grace else GRACE_PERIOD
+            schedule(file, dest, verb, int(csv_export or 0), grace_period, extensions_path)
+        else:
+            print("Usage: CLASSLIST_PATH, DESTINATION, VERBOSE, [CSV_EXPORT], [GRACE_PERIOD], [EXTENSIONS_PATH]")
+            sys.exit(1)
+    elif func == 'outcomes':
+        if 6 <= len(sys.argv) <= 8:
             assn = sys.argv[2]
-            outof(assn)
+            file = sys.argv[3]
+            dest = sys.argv[4]
+            verb = sys.argv[5]
+            grace, extensions_path = (sys.argv[6:] + ['', ''])[:2]
+            grace_period = float(grace) if grace else GRACE_PERIOD
+            outcomes(assn, file, dest, verb, grace_period, extensions_path)
+        else:
+            print("Usage: ASSIGNMENT_NUM, CLASSLIST_PATH, DESTINATION, [GRACE_PERIOD], [EXTENSIONS_PATH]")
+            sys.exit(1)
+    elif func == 'history':
+        if 6 <= len(sys.argv) <= 9:
+            assn = sys.argv[2]
+            file = sys.argv[3]
+            dest = sys.argv[4]
+            verb = sys.argv[5]
+            grace, extensions_path, archives = (sys.argv[6:] + ['', '', ''])[:3]
+            grace_period = float(grace) if grace else GRACE_PERIOD
+            history(assn, file, dest, verb, grace_period, extensions_path, int(archives or 0))
+        else:
+            print("Usage: ASSIGNMENT_NUM, CLASSLIST_PATH, DESTINATION, VERBOSE, [GRACE_PERIOD], [EXTENSIONS_PATH], [ARCHIVES]")
+            sys.exit(1)
+    elif func == 'plan':
+        if 5 <= len(sys.argv) <= 11 and sys.argv[2] in ('marks', 'download', 'outcomes', 'history'):
+            operation = sys.argv[2]
+            assn = sys.argv[3]
+            file = sys.argv[4]
+            # optional arguments may be passed as '' to keep their default
+            verb, snapshot_path, grace, extensions_path, incremental, dest = (sys.argv[5:] + [''] * 6)[:6]
+            grace_period = float(grace) if grace else GRACE_PERIOD
+            plan(operation, assn, file, verb or 0, snapshot_path, grace_period, extensions_path,
+                 int(incremental or 0), dest)
+        else:
+            print("Usage: marks|download|outcomes|history ASSIGNMENT_NUM CLASSLIST_PATH [VERBOSE] "
+                  "[SNAPSHOT_PATH] [GRACE_PERIOD] [EXTENSIONS_PATH] [INCREMENTAL] [DESTINATION]")
+            sys.exit(1)
+    elif func == 'extract':
+        if 4 <= len(sys.argv) <= 6:
+            source = sys.argv[2]
+            dest = sys.argv[3]
+            patterns, verb = (sys.argv[4:] + ['', ''])[:2]
+            extract(source, dest, patterns or '*', verb or 0)
+        else:
+            print("Usage: SOURCE, DESTINATION, [PATTERNS], [VERBOSE]")
+            sys.exit(1)
+    elif func == 'courses':
+        if len(sys.argv) >= 5 and sys.argv[2] == 'outof':
+            coursenames = sys.argv[3].upper().split(',')
+            assn = sys.argv[4]
+            courses_outof(coursenames, assn)
+        elif 8 <= len(sys.argv) <= 12 and sys.argv[2] == 'marks':
+            coursenames = sys.argv[3].upper().split(',')
+            assn = sys.argv[4]
+            file = sys.argv[5]
+            dest = sys.argv[6]
+            verb = sys.argv[7]
+            grace, extensions_path, incremental, csv_export = (sys.argv[8:] + ['', '', '', ''])[:4]
+            grace_period = float(grace) if grace else GRACE_PERIOD
+            courses_marks(coursenames, assn, file, dest, verb, grace_period, extensions_path,
+                          int(incremental or 0), int(csv_export or 0))
         else:
-            print("Usage: ASSIGNMENT_NUM")
+            print("Usage: outof COURSES ASSIGNMENT_NUM")
+            print("       marks COURSES ASSIGNMENT_NUM CLASSLIST_PATH DESTINATION VERBOSE [GRACE_PERIOD] [EXTENSIONS_PATH] [INCREMENTAL] [CSV_EXPORT]")
             sys.exit(1)
     else:
         print("Invalid function call")
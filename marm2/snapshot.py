@@ -0,0 +1,168 @@
+## =======================================================
+## Program: Marmoset Submissions Snapshot (snapshot)
+## Created Time: 2026-10-19
+## Used by: marm2.py
+## Company: University of Waterloo
+## Department: School of Computer Science
+## =======================================================
+
+import json
+import os
+import sys
+import zipfile
+from array import array
+from datetime import datetime
+
+# ====================================================================
+# FOLLOWING IS SNAPSHOT SETUP
+# ====================================================================
+# Bump when the file layout changes; older snapshots are then rebuilt
+SNAPSHOT_VERSION = 2
+
+# Columns of the submissions table kept in the snapshot, all stored as int64
+# (submission_timestamp as epoch seconds, NULL archive_pk as 0)
+COLUMNS = ['submission_pk',
+           'project_pk',
+           'student_registration_pk',
+           'submission_timestamp',
+           'num_passed_overall',
+           'archive_pk']
+
+# ====================================================================
+# Functions
+# ====================================================================
+
+def empty_snapshot():
+    """
+    Returns an empty snapshot.
+
+    Returns:
+    - tuple: (meta, columns) where meta is a dict and columns maps each name in COLUMNS to an array('q').
+    """
+    meta = {'version': SNAPSHOT_VERSION,
+            'last_submission_pk': 0,
+            'projects': [],
+            'students': [],
+            'untested': []}
+    return meta, {name: array('q') for name in COLUMNS}
+
+
+def read_snapshot(path: str):
+    """
+    Reads a snapshot file.
+
+    Parameters:
+    - path (str): The snapshot file path.
+
+    Returns:
+    - tuple: (meta, columns) as described in `empty_snapshot`. An empty snapshot is
+      returned if the file does not exist or was written by another SNAPSHOT_VERSION.
+
+    The file is a zip archive holding meta.json and one raw little-endian int64
+    file per column, so a single column can be loaded without parsing the others.
+    """
+    if not os.path.exists(path):
+        return empty_snapshot()
+    with zipfile.ZipFile(path, mode='r') as snapshot:
+        meta = json.loads(snapshot.read('meta.json'))
+        if meta.get('version') != SNAPSHOT_VERSION:
+            return empty_snapshot()
+        columns = {}
+        for name in COLUMNS:
+            column = array('q')
+            column.frombytes(snapshot.read(f'{name}.i64'))
+            if sys.byteorder != 'little':
+                column.byteswap()
+            columns[name] = column
+    return meta, columns
+
+
+def write_snapshot(path: str, meta: dict, columns: dict):
+    """
+    Writes a snapshot file atomically (the old file is only replaced once the new one is complete).
+
+    Parameters:
+    - path (str): The snapshot file path.
+    - meta (dict): Snapshot metadata.
+    - columns (dict): Column name to array('q').
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f'{path}.tmp'
+    with zipfile.ZipFile(temp_path, mode='w', compression=zipfile.ZIP_DEFLATED) as snapshot:
+        snapshot.writestr('meta.json', json.dumps(meta, indent=1))
+        for name in COLUMNS:
+            column = columns[name]
+            if sys.byteorder != 'little':
+                column = array('q', column)
+                column.byteswap()
+            snapshot.writestr(f'{name}.i64', column.tobytes())
+    os.replace(temp_path, path)
+
+
+def append_submissions(columns: dict, submissions: list):
+    """
+    Appends submissions rows fetched from the database to the snapshot columns.
+
+    Parameters:
+    - columns (dict): Column name to array('q').
+    - submissions (list): Rows (dicts) with every key in COLUMNS.
+
+    Returns:
+    - list: [submission_pk, project_pk] of every row not tested yet (num_passed_overall NULL);
+      they are stored with 0 passed until `update_submissions` re-reads them.
+    """
+    untested = []
+    for item in submissions:
+        if item['num_passed_overall'] is None:
+            untested.append([item['submission_pk'], item['project_pk']])
+        columns['submission_pk'].append(item['submission_pk'])
+        columns['project_pk'].append(item['project_pk'])
+        columns['student_registration_pk'].append(item['student_registration_pk'])
+        columns['submission_timestamp'].append(int(item['submission_timestamp'].timestamp()))
+        columns['num_passed_overall'].append(item['num_passed_overall'] or 0)
+        columns['archive_pk'].append(item['archive_pk'] or 0)
+    return untested
+
+
+def update_submissions(columns: dict, untested: list, submissions: list):
+    """
+    Stores the test results of submissions that were not tested when first captured.
+
+    Parameters:
+    - columns (dict): Column name to array('q').
+    - untested (list): [submission_pk, project_pk] pairs as returned by `append_submissions`.
+    - submissions (list): Re-read rows with 'submission_pk' and 'num_passed_overall'.
+
+    Returns:
+    - list: The pairs of `untested` that are still not tested. Submissions no longer in
+      the database are dropped.
+    """
+    passed = {item['submission_pk']: item['num_passed_overall'] for item in submissions}
+    tested = {pk: num for pk, num in passed.items() if num is not None}
+    if tested:
+        for i, submission_pk in enumerate(columns['submission_pk']):
+            if submission_pk in tested:
+                columns['num_passed_overall'][i] = tested[submission_pk]
+    return [pair for pair in untested if pair[0] in passed and pair[0] not in tested]
+
+
+def group_submissions(columns: dict, project_pks: set):
+    """
+    Groups the snapshot submissions of the given projects by project.
+
+    Parameters:
+    - columns (dict): Column name to array('q').
+    - project_pks (set): The projects to keep.
+
+    Returns:
+    - dict: project_pk -> list of rows shaped like the database rows used by marm2.py
+      (student_registration_pk, submission_timestamp as datetime, num_passed_overall, archive_pk).
+    """
+    grouped = {project_pk: [] for project_pk in project_pks}
+    for i, project_pk in enumerate(columns['project_pk']):
+        if project_pk in grouped:
+            grouped[project_pk].append({'student_registration_pk': columns['student_registration_pk'][i],
+                                        'submission_timestamp': datetime.fromtimestamp(columns['submission_timestamp'][i]),
+                                        'num_passed_overall': columns['num_passed_overall'][i],
+                                        'archive_pk': columns['archive_pk'][i]})
+    return grouped
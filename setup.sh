@@ -49,6 +49,9 @@ script_dir="$( cd "$( dirname "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )"
 # add execute permission
 chmod +x "$script_dir/edx/modules/edx_diff.py"
 chmod +x "$script_dir/edx/modules/edx_generater.py"
+chmod +x "$script_dir/edx/modules/edx_lookup.py"
+chmod +x "$script_dir/edx/modules/edx_metrics.py"
+chmod +x "$script_dir/edx/modules/edx_stats.py"
 chmod +x "$script_dir/marm2/marm2.py"
 
 # Main function calls